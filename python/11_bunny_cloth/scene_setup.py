@@ -0,0 +1,48 @@
+from uipc import Transform, Vector3, view, builtin
+from uipc.core import Scene
+from uipc.geometry import SimplicialComplexIO, label_surface
+from uipc.constitution import AffineBodyConstitution, NeoHookeanShell, DiscreteShellBending, ElasticModuli
+from uipc.unit import MPa, kPa
+
+from asset_dir import AssetDir
+from samples_common import read_mesh
+
+def build_scene():
+    # no GUI here, the scene is shared by main.py and `python -m samples run`
+    trimesh_path = AssetDir.trimesh_path()
+    tetmesh_path = AssetDir.tetmesh_path()
+
+    config = Scene.default_config()
+    config['dt'] = 0.01
+    config['contact']['d_hat'] = 0.01
+    print(config)
+    scene = Scene(config)
+
+    # begin setup the scene
+    cloth = scene.objects().create('cloth')
+    t = Transform.Identity()
+    t.scale(2.0)
+    io = SimplicialComplexIO(t)
+    cloth_mesh = io.read(f'{trimesh_path}/grid20x20.obj')
+    label_surface(cloth_mesh)
+    nks = NeoHookeanShell()
+    dsb = DiscreteShellBending()
+    moduli = ElasticModuli.youngs_poisson(10 * kPa, 0.499)
+    nks.apply_to(cloth_mesh, moduli=moduli, mass_density=200, thickness=0.001)
+    dsb.apply_to(cloth_mesh, bending_stiffness=10.0)
+    view(cloth_mesh.positions())[:] += 1.0
+    cloth.geometries().create(cloth_mesh)
+
+    bunny = scene.objects().create('bunny')
+    t = Transform.Identity()
+    t.translate(Vector3.UnitX() + Vector3.UnitZ())
+    bunny_mesh = read_mesh(f'{tetmesh_path}/bunny0.msh', t)
+    abd = AffineBodyConstitution()
+    abd.apply_to(bunny_mesh, 100 * MPa)
+    is_fixed = bunny_mesh.instances().find(builtin.is_fixed)
+    view(is_fixed)[:] = 1
+
+    bunny.geometries().create(bunny_mesh)
+    # end setup the scene
+
+    return scene
@@ -5,111 +5,488 @@
 # @date 2025-05-17
 # @version 1.0
 # ---------------------------------
+import os
+import re
 import json
+import hashlib
+import numpy as np
 from asset_dir import AssetDir
+from scene_index import KeyIndex, PAYLOAD_KEYS
+from scene_stream import SceneStream, assign, add_empty_arrays
 
-def flatten_json(y):
-    out = {}
+_SCALAR_DTYPES = {
+    "F32": np.float32, "F64": np.float64,
+    "I32": np.int32, "I64": np.int64,
+    "U32": np.uint32, "U64": np.uint64,
+}
+# Vector3, Vector2i, Matrix4x4, Matrix12x12 ...
+_TENSOR_TYPE = re.compile(r"^(Vector|Matrix)(\d+)(?:x(\d+))?(i)?$")
 
-    def flatten(x, name=''):
+def attribute_layout(attr_type: str):
+    """
+    :return: (dtype, shape of one value, whether vectors are stored as columns),
+             None for types without a numpy layout (e.g. string)
+    """
+    if attr_type in _SCALAR_DTYPES:
+        return _SCALAR_DTYPES[attr_type], (), False
+    m = _TENSOR_TYPE.match(attr_type)
+    if m is None:
+        return None
+    kind, rows, cols, integer = m.groups()
+    dtype = np.int32 if integer else np.float64
+    if kind == "Vector":
+        # a vector is stored as a column, [[x], [y], [z]]
+        return dtype, (int(rows),), True
+    return dtype, (int(rows), int(cols or rows)), False
 
-        # If the Nested key-value
-        # pair is of dict type
-        if type(x) is dict:
+def values_to_array(attr_type: str, values):
+    layout = attribute_layout(attr_type)
+    if layout is None:
+        raise TypeError(f"attribute type {attr_type} has no array layout")
+    dtype, shape, _ = layout
+    return np.array(values, dtype=dtype).reshape((len(values),) + shape)
 
-            for a in x:
-                flatten(x[a], name + a + '_')
+def array_to_values(attr_type: str, array: np.ndarray):
+    _, _, column = attribute_layout(attr_type)
+    if column:
+        return array[..., None].tolist()
+    return array.tolist()
 
-        # If the Nested key-value
-        # pair is of list type
-        elif type(x) is list:
+def object_labels(objects):
+    """
+    :param objects: the objects of a scene, in order
+    :return: a label per object, its name; names are not unique, the n-th object of a
+             name (from 0) is "name#n" for n > 0. Unlike ids, the labels of the other
+             objects stay the same when an object is inserted.
+    """
+    labels = []
+    occurrences = {}
+    for obj in objects:
+        n = occurrences.get(obj["name"], 0)
+        occurrences[obj["name"]] = n + 1
+        labels.append(obj["name"] if n == 0 else f"{obj['name']}#{n}")
+    return labels
 
-            i = 0
+def _checksum(array: np.ndarray):
+    return hashlib.blake2b(np.ascontiguousarray(array).view(np.uint8), digest_size=16).digest()
 
-            for a in x:
-                flatten(a, name + str(i) + '_')
-                i += 1
-        else:
-            out[name[:-1]] = x
+# where SceneIO keeps the attributes of all geometries
+_ATTRIBUTES_PATH = ("__data__", "geometry_atlas", "__data__", "attributes")
+_COPY_CHUNK = 1 << 20
 
-    flatten(y)
-    return out
+def _with_value(root, path, value):
+    # a copy of root with the value at path replaced, only the dicts on the path are copied
+    if not path:
+        return value
+    copy = dict(root)
+    copy[path[0]] = _with_value(root[path[0]], path[1:], value)
+    return copy
 
-def unflatten_json(y):
-    out = {}
+def _copy_bytes(src, dst, begin, end):
+    src.seek(begin)
+    while begin < end:
+        chunk = src.read(min(_COPY_CHUNK, end - begin))
+        if not chunk:
+            raise ValueError("unexpected end of the scene file")
+        dst.write(chunk)
+        begin += len(chunk)
 
-    for a in y:
-        keys = a.split('_')
-        d = out
 
-        for i in range(len(keys) - 1):
-            if keys[i] not in d:
-                d[keys[i]] = {}
-            d = d[keys[i]]
+class _Payload:
+    # the "values" or "default_value" of an attribute, still only in the source file
+    __slots__ = ("attr_id", "key")
 
-        d[keys[-1]] = y[a]
+    def __init__(self, attr_id: int, key: str):
+        self.attr_id = attr_id
+        self.key = key
 
-    return out
+    def __repr__(self):
+        return f"<{self.key} of attribute {self.attr_id}, not read yet>"
 
 
 class SceneEdit:
-    def __init__(self, scene_path: str):
+    """
+    Indexed access to the objects, geometries and attributes of a scene json.
+
+    The file is streamed once (scene_stream.py) to build the index: the structure of the
+    scene is kept, of the attributes only their type and their byte span in the file. The
+    values of an attribute are read and decoded when they are accessed, so the memory
+    needed is the structure plus the attributes in use. save() copies the attributes that
+    were not edited from the source file by their spans, the source must not change while
+    the SceneEdit is in use.
+
+    Objects are identified by id, uipc does not require unique names. Where a method takes
+    an object, the id or the name works, a name shared by several objects raises ValueError.
+
+    Geometries share attributes, e.g. the copies of a mesh and the rest geometries. The
+    arrays of attribute() are copied on write: if the attribute of the geometry is shared,
+    an edit goes to a new attribute of that geometry alone. array() edits the attribute
+    itself, for every geometry that uses it.
+    """
+    def __init__(self, scene_path: str, verbose: bool = False):
         self.name = "scene"
         self.scene_path = scene_path
-        self.scene_dict = json.load(open(scene_path, "r"))
-        self.scene_dict_flat = flatten_json(self.scene_dict)
-        # save the scene_dict_flat to a lmdb in memory
-        self.geometries = self.scene_dict["__data__"]["geometry_atlas"]["__data__"]["geometries"]
-        # print("geometries", self.geometries)
-        print("Number of geometries", len(self.geometries)) # 20
-        self.attributes = self.scene_dict["__data__"]["geometry_atlas"]["__data__"]["attributes"]
+        self._source_stat = os.stat(scene_path)
+        stream = SceneStream(scene_path)
+        self.scene_dict = {}
+        for kind, path, value in stream.events():
+            if kind == "attribute":
+                # the payloads are dropped, they are read again from the file when accessed
+                value = dict(value)
+                value["__data__"] = {k: _Payload(path[-1], k) if k in PAYLOAD_KEYS else v
+                                     for k, v in value["__data__"].items()}
+            assign(self.scene_dict, kind, path, value)
+        add_empty_arrays(self.scene_dict)
+        # byte spans in the source: of every attribute, and of the array of all of them
+        self._spans = list(zip(stream.attribute_offsets, stream.attribute_ends))
+        self._array_span = stream.array_spans.get(_ATTRIBUTES_PATH)
+        with open(scene_path, "rb") as f:
+            # keep the layout of the source on save, pretty-printed (SceneIO) or compact
+            self._indent = 4 if f.read(2) == b"{\n" else None
+            self._element_indent = ""
+            if self._spans:
+                f.seek(self._array_span[0] + 1)
+                gap = f.read(self._spans[0][0] - self._array_span[0] - 1).decode()
+                self._element_indent = gap[gap.rfind("\n") + 1:]
+
+        data = self.scene_dict["__data__"]
+        atlas = data["geometry_atlas"]["__data__"]
+        self.geometries = atlas["geometries"]
+        self.attributes = atlas["attributes"]
+        self.geometry_slots = data["geometry_slots"]
+        self.rest_geometry_slots = data["rest_geometry_slots"]
+        self.objects = data["object_collection"]["objects"]
+
+        # the in-memory index: object id -> geometry slot -> geometry -> attribute
+        self.index = self._build_index()
+        # object name -> ids of the objects of that name
+        self.object_ids = {}
+        for obj in self.objects:
+            self.object_ids.setdefault(obj["name"], []).append(obj["id"])
+        self.object_name = {obj["id"]: obj["name"] for obj in self.objects}
+        self.object_label = {obj["id"]: l for obj, l in zip(self.objects, object_labels(self.objects))}
+        # "object/slot/collection/attribute" -> attribute index
+        self.paths = self._build_paths()
+        # attribute id -> the geometries using it, [(geometry index, "collection/attribute")]
+        self.users = {}
+        for g, gg in enumerate(self.geometries):
+            for collection, c in gg["__data__"].items():
+                for attr_name, attr in (c["__data__"] or {}).items():
+                    self.users.setdefault(attr["index"], []).append((g, f"{collection}/{attr_name}"))
+
+        # trie + n-gram index over the flat keys, for __call__ and prefix(),
+        # payloads are read when a query reaches them
+        self.keys = KeyIndex(self.scene_dict, resolve=self._resolve)
+
+        # attribute id -> numpy array handed out by array(), and its checksum at that time
+        self._arrays = {}
+        self._checksums = {}
+        # attributes whose values differ from the source file
+        self._modified = set()
+        # (geometry index, "collection/attribute") -> (shared attribute id, private copy
+        # handed out by attribute(), its checksum), the copy becomes an attribute once edited
+        self._private = {}
+
+        if verbose:
+            self.summary()
+
+    def _build_index(self):
+        geometry_of_slot = {s["id"]: s["index"] for s in self.geometry_slots}
+        rest_geometry_of_slot = {s["id"]: s["index"] for s in self.rest_geometry_slots}
+        index = {}
+        for obj in self.objects:
+            slots = {}
+            for slot_id in obj["geometries"]:
+                g = geometry_of_slot[slot_id]
+                gg = self.geometries[g]
+                attributes = {}
+                for collection, c in gg["__data__"].items():
+                    # empty attribute collections are stored as null
+                    for attr_name, attr in (c["__data__"] or {}).items():
+                        attributes[f"{collection}/{attr_name}"] = attr["index"]
+                slots[slot_id] = {
+                    "geometry": g,
+                    "rest_geometry": rest_geometry_of_slot.get(slot_id),
+                    "type": gg["__meta__"]["type"],
+                    "attributes": attributes,
+                }
+            index[obj["id"]] = slots
+        return index
+
+    def _build_paths(self):
+        paths = {}
+        for obj_id, slots in self.index.items():
+            for slot_id, entry in slots.items():
+                for key, attr_id in entry["attributes"].items():
+                    paths[f"{self.label(obj_id)}/{slot_id}/{key}"] = attr_id
+        return paths
+
+    def _check_source(self):
+        stat = os.stat(self.scene_path)
+        if (stat.st_mtime_ns, stat.st_size) != (self._source_stat.st_mtime_ns, self._source_stat.st_size):
+            raise RuntimeError(f"{self.scene_path} changed since it was indexed")
+
+    def _read_attribute(self, attr_id: int):
+        # decode one attribute of the source file, from its span
+        self._check_source()
+        begin, end = self._spans[attr_id]
+        with open(self.scene_path, "rb") as f:
+            f.seek(begin)
+            return json.loads(f.read(end - begin))
+
+    def _data(self, attr_id: int, key: str):
+        # a member of the "__data__" of an attribute, read from the source if not in memory
+        value = self.attributes[attr_id]["__data__"][key]
+        if isinstance(value, _Payload):
+            return self._read_attribute(value.attr_id)["__data__"][value.key]
+        return value
+
+    def _resolve(self, value):
+        if isinstance(value, _Payload):
+            return self._data(value.attr_id, value.key)
+        return value
+
+    def _attribute_json(self, attr_id: int):
+        # the attribute as SceneIO json, with its payloads
+        attr = self.attributes[attr_id]
+        return _with_value(attr, ("__data__",), {k: self._data(attr_id, k) for k in attr["__data__"]})
+
+    def label(self, obj_id: int):
+        """
+        :return: the label of an object, see object_labels
+        """
+        return self.object_label[obj_id]
+
+    def object_id(self, obj):
+        """
+        :param obj: an object id, or a name only one object has
+        """
+        if isinstance(obj, int):
+            if obj not in self.index:
+                raise KeyError(f"no object with id {obj}")
+            return obj
+        ids = self.object_ids.get(obj)
+        if ids is None:
+            raise KeyError(f"no object named {obj!r}")
+        if len(ids) > 1:
+            raise ValueError(f"{len(ids)} objects are named {obj!r} (ids {ids}), use the id")
+        return ids[0]
+
+    def summary(self):
+        print("Number of geometries", len(self.geometries))
         print("Number of attributes", len(self.attributes))
-        self.geometry_slots = self.scene_dict["__data__"]["geometry_slots"]
         print("Number of geometry slots", len(self.geometry_slots))
-        self.objects = self.scene_dict["__data__"]["object_collection"]["objects"]
         print("Number of objects", len(self.objects))
-        for i, obj in enumerate(self.objects):
-            print(f"Object {i}: {obj}")
-            obj_geom = obj["geometries"]
-            for obj_g in obj_geom:
-                print(f"Object {i} Geometry: {obj_g}")
-                g_slot = self.geometry_slots[obj_g]["index"]
-                print(f"Object {i} Geometry Slot: {g_slot}")
-                gg = self.geometries[g_slot]
-                print(f"Object {i} Geometry: {gg}")
-                g_type = gg["__meta__"]["type"]
-                print(f"Object {i} Geometry Type: {g_type}")
-
-                if g_type == "SimplicialComplex":
-                    v = gg["__data__"]["vertices"]
-                    v_pos_attr_id = v["__data__"]["position"]["index"]
-                    v_pos_attr = self.attributes[v_pos_attr_id]
-                    tri = gg["__data__"]["triangles"]
-
-                    print(v_pos_attr)
+        for obj_id, slots in self.index.items():
+            print(f"Object {self.label(obj_id)} (id {obj_id}): {len(slots)} geometries")
+            for slot_id, entry in slots.items():
+                print(f"  Slot {slot_id}: geometry {entry['geometry']} ({entry['type']}), {len(entry['attributes'])} attributes")
+
+    def object_names(self):
+        return [self.object_name[obj_id] for obj_id in self.index]
+
+    def geometry_slots_of(self, obj):
+        return list(self.index[self.object_id(obj)].keys())
+
+    def attribute_index(self, obj, slot_id: int, key: str):
+        """
+        :param obj: object id or name
+        :param key: "collection/attribute", e.g. "vertices/position" or "instances/transform"
+        """
+        return self.index[self.object_id(obj)][slot_id]["attributes"][key]
+
+    def attribute(self, obj, slot_id: int, key: str):
+        """
+        :return: the attribute values as a numpy array, e.g. attribute("ramp", 8, "vertices/position")
+                 is a (n, 3) float64 array, edit it in place and save(). If other geometries
+                 share the attribute, the array is a copy and an edit only changes this geometry.
+        """
+        entry = self.index[self.object_id(obj)][slot_id]
+        attr_id = entry["attributes"][key]
+        if len(self.users[attr_id]) == 1 or attribute_layout(self.attribute_type(attr_id)) is None:
+            return self._payload(attr_id)
+        private = self._private.get((entry["geometry"], key))
+        if private is None:
+            array = self.array(attr_id).copy()
+            private = (attr_id, array, _checksum(array))
+            self._private[(entry["geometry"], key)] = private
+        return private[1]
+
+    def shared(self, obj, slot_id: int, key: str):
+        """
+        :return: the geometries using the attribute of a geometry, [(geometry index, "collection/attribute")]
+        """
+        return list(self.users[self.attribute_index(obj, slot_id, key)])
+
+    def _unshare(self, g: int, key: str, attr_id: int):
+        # give geometry g a new attribute, a copy of attr_id, in place of the shared one
+        new_id = len(self.attributes)
+        attr = self.attributes[attr_id]
+        self.attributes.append(_with_value(attr, ("__data__",), dict(attr["__data__"])))
+        collection, attr_name = key.split("/", 1)
+        self.geometries[g]["__data__"][collection]["__data__"][attr_name]["index"] = new_id
+        self.users[attr_id].remove((g, key))
+        self.users[new_id] = [(g, key)]
+        for slots in self.index.values():
+            for entry in slots.values():
+                if entry["geometry"] == g:
+                    entry["attributes"][key] = new_id
+        self.paths = self._build_paths()
+        return new_id
+
+    def attribute_type(self, attr_id: int):
+        return self.attributes[attr_id]["__meta__"]["type"]
+
+    def attribute_values(self, attr_id: int):
+        """
+        The values of an attribute as SceneIO stores them, read from the file on every call
+        until the attribute is edited.
+        """
+        return self._data(attr_id, "values")
+
+    def array(self, attr_id: int):
+        """
+        The values of an attribute as a numpy array (vectors as (n, k), matrices as (n, r, c)).
+        The same array is returned on every call, in-place edits are written back by flush()/save()
+        and change every geometry using the attribute, see attribute() for one geometry only.
+        """
+        array = self._arrays.get(attr_id)
+        if array is None:
+            array = values_to_array(self.attribute_type(attr_id), self.attribute_values(attr_id))
+            self._arrays[attr_id] = array
+            self._checksums[attr_id] = _checksum(array)
+        return array
+
+    def _payload(self, attr_id: int):
+        # the array if the type has one, the plain values otherwise (e.g. string)
+        if attribute_layout(self.attribute_type(attr_id)) is None:
+            return self.attribute_values(attr_id)
+        return self.array(attr_id)
+
+    def set_array(self, attr_id: int, array):
+        """
+        Replace the values of an attribute, the shape of one value must stay the same.
+        """
+        dtype, shape, _ = attribute_layout(self.attribute_type(attr_id))
+        array = np.asarray(array, dtype=dtype)
+        if array.shape[1:] != shape:
+            raise ValueError(f"attribute {attr_id}: expected values of shape {shape}, got {array.shape[1:]}")
+        self._arrays[attr_id] = array
+        self._checksums[attr_id] = None
+
+    def dirty(self):
+        """
+        :return: ids of the attributes whose arrays changed since they were handed out or last flushed
+        """
+        return [i for i, a in self._arrays.items() if self._checksums[i] != _checksum(a)]
+
+    def flush(self):
+        """
+        Write the changed arrays back into the scene dict, only those are re-encoded.
+        The edited copies of shared attributes become new attributes of their geometry.
+        """
+        for (g, key), (attr_id, array, checksum) in list(self._private.items()):
+            if _checksum(array) != checksum:
+                new_id = self._unshare(g, key, attr_id)
+                self._arrays[new_id] = array
+                self._checksums[new_id] = None
+                del self._private[(g, key)]
+        dirty = self.dirty()
+        for attr_id in dirty:
+            array = self._arrays[attr_id]
+            self.attributes[attr_id]["__data__"]["values"] = array_to_values(self.attribute_type(attr_id), array)
+            self._checksums[attr_id] = _checksum(array)
+            self._modified.add(attr_id)
+        return dirty
+
+    def save(self, path: str):
+        """
+        Save the scene as json. Attributes that were not modified are copied
+        from the source file as they are, only the edited ones are encoded again.
+        """
+        self.flush()
+        indent = self._indent
+        if self._array_span is None:
+            with open(path, "w") as f:
+                json.dump(self.to_json(), f, indent=indent)
+            return
+
+        # encode everything else, with a marker in place of the attribute array
+        marker = "\u0000attributes\u0000"
+        head, tail = json.dumps(_with_value(self.scene_dict, _ATTRIBUTES_PATH, marker), indent=indent).split(json.dumps(marker))
+        self._check_source()
+        with open(self.scene_path, "rb") as src, open(path, "wb") as f:
+            f.write(head.encode())
+            # the attribute array as it is in the source, with the modified elements replaced
+            last, array_end = self._array_span
+            for i in sorted(self._modified):
+                if i < len(self._spans):
+                    begin, end = self._spans[i]
+                    _copy_bytes(src, f, last, begin)
+                    last = end
                 else:
-                    print(f"Object {i} Geometry Type: {g_type} is not SimplicialComplex")
+                    # a copy of a shared attribute, appended after the ones of the source
+                    _copy_bytes(src, f, last, self._spans[-1][1])
+                    last = self._spans[-1][1]
+                    f.write(("," + ("\n" + self._element_indent if indent is not None else " ")).encode())
+                encoded = json.dumps(self._attribute_json(i), indent=indent)
+                if indent is not None:
+                    # indent the new element like the others
+                    encoded = encoded.replace("\n", "\n" + self._element_indent)
+                f.write(encoded.encode())
+            _copy_bytes(src, f, last, array_end)
+            f.write(tail.encode())
 
     def __call__(self, pattern: str):
         """
         :param pattern: the pattern to search for
         :return: a list of objects that match the pattern
         """
+        return self.keys.search(pattern)
+
+    def prefix(self, prefix: str):
+        """
+        :return: the (key, value) pairs whose flat key starts with prefix
+        """
+        return self.keys.prefix(prefix)
+
+    def select(self, obj=None, key: str = None):
+        """
+        Attributes by object and "collection/attribute" key, through the index only,
+        e.g. select("cubes", "vertices/position") for the positions of all the cubes.
+
+        :return: a list of ("object/slot/collection/attribute", values)
+        """
         result = []
-        for k, v in self.scene_dict_flat.items():
-            if pattern in k:
-                result.append((k, v))
+        ids = self.index.keys() if obj is None else [self.object_id(obj)]
+        for obj_id in ids:
+            for slot_id, entry in self.index[obj_id].items():
+                for k, attr_id in entry["attributes"].items():
+                    if key is None or k == key:
+                        result.append((f"{self.label(obj_id)}/{slot_id}/{k}", self._payload(attr_id)))
         return result
 
 
     def to_json(self):
-        return unflatten_json(self.scene_dict_flat)
+        """
+        :return: the whole scene as SceneIO json, every attribute is read, e.g. for SceneIO.from_json
+        """
+        self.flush()
+        attributes = [self._attribute_json(i) for i in range(len(self.attributes))]
+        return _with_value(self.scene_dict, _ATTRIBUTES_PATH, attributes)
 
 if __name__ == "__main__":
     folder = AssetDir.folder(__file__)
     scene_path = f"{folder}/scene.json"
-    scene_edit = SceneEdit(scene_path)
+    scene_edit = SceneEdit(scene_path, verbose=True)
+    workspace = AssetDir.output_path(__file__)
+    # lift the ramp: its transform is shared with its rest geometry, the edit gives the
+    # ramp its own copy, save then encodes only that new attribute
+    transform = scene_edit.attribute("ramp", 8, "instances/transform")
+    transform[:, 1, 3] += 0.1
+    scene_edit.save(f"{workspace}/scene_edited.json")
+    print(f"ramp transform: attribute {scene_edit.attribute_index('ramp', 8, 'instances/transform')}, "
+          f"used by geometries {[g for g, _ in scene_edit.shared('ramp', 8, 'instances/transform')]}")
     # objects = scene_edit("objectsd")
     # geometries = scene_edit("geometry_atlas___data___geometries")
     # print(geometries)
-
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# @file scene_columnar.py
+# @brief Columnar scene format: structure as json, attribute arrays as one binary blob
+# ---------------------------------
+#
+# A converted scene is a folder:
+#
+#     structure.json   the SceneIO json, the "values" of every numeric attribute replaced by
+#                      {"offset": byte offset, "count": number of values}, dtype and shape
+#                      follow from the attribute type
+#     columns.bin      the attribute arrays, raw little endian, each aligned to 64 bytes
+#
+# Arrays smaller than min_bytes stay inline, a column and its alignment cost more than a few
+# numbers. At the default of 128 bytes the positions and topology of a cube get a column.
+#
+# Arrays are content addressed: geometries made by mesh.copy() share their topology and
+# rest shape, identical arrays are written once and all their attributes point to it.
+#
+# Loading only parses structure.json, the arrays are numpy views of the memory-mapped blob.
+#
+#     python scene_columnar.py scene.json scene.columnar
+#     python scene_columnar.py scene.columnar scene_back.json
+import os
+import sys
+import json
+import hashlib
+import pathlib
+import numpy as np
+
+from edit_scene import attribute_layout, values_to_array, array_to_values
+from scene_stream import SceneStream, assign, add_empty_arrays
+
+FORMAT = "uipc-columnar"
+VERSION = 1
+STRUCTURE = "structure.json"
+COLUMNS = "columns.bin"
+_ALIGN = 64
+
+
+def _column_layout(attr_type):
+    dtype, shape, _ = attribute_layout(attr_type)
+    return np.dtype(dtype).newbyteorder("<"), shape
+
+
+def convert(scene_path, folder, min_bytes: int = 128, dedup: bool = True):
+    """
+    Convert a SceneIO scene.json to the columnar format. The scene is streamed,
+    only one attribute is decoded at a time.
+
+    :param dedup: store identical arrays once
+    :return: (number of columns, number of distinct columns written)
+    """
+    folder = pathlib.Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    structure = {}
+    offset = 0
+    # content hash -> offset of the array already written
+    written = {}
+    columns = 0
+    with open(folder / COLUMNS, "wb") as blob:
+        for kind, path, value in SceneStream(scene_path).events():
+            if kind == "attribute" and attribute_layout(value["__meta__"]["type"]) is not None:
+                data = value["__data__"]
+                dtype, _ = _column_layout(value["__meta__"]["type"])
+                array = values_to_array(value["__meta__"]["type"], data["values"]).astype(dtype, copy=False)
+                if array.nbytes >= min_bytes:
+                    columns += 1
+                    data_bytes = array.tobytes()
+                    key = hashlib.sha256(data_bytes).digest() if dedup else columns
+                    if key not in written:
+                        padding = -offset % _ALIGN
+                        blob.write(b"\0" * padding)
+                        offset += padding
+                        blob.write(data_bytes)
+                        written[key] = offset
+                        offset += len(data_bytes)
+                    data["values"] = {"offset": written[key], "count": len(array)}
+            assign(structure, kind, path, value)
+    add_empty_arrays(structure)
+    with open(folder / STRUCTURE, "w") as f:
+        json.dump({"format": FORMAT, "version": VERSION, "scene": structure}, f)
+    return columns, len(written)
+
+
+class ColumnarScene:
+    """
+    A scene in the columnar format, the attribute arrays are memory-mapped on load.
+    """
+    def __init__(self, folder):
+        self.folder = pathlib.Path(folder)
+        with open(self.folder / STRUCTURE, "r") as f:
+            structure = json.load(f)
+        if structure.get("format") != FORMAT or structure.get("version") != VERSION:
+            raise ValueError(f"{folder} is not a version {VERSION} {FORMAT} scene")
+        self.scene_dict = structure["scene"]
+        self.attributes = self.scene_dict["__data__"]["geometry_atlas"]["__data__"]["attributes"]
+        path = self.folder / COLUMNS
+        # np.memmap refuses empty files
+        if os.path.getsize(path) > 0:
+            self.blob = np.memmap(path, dtype=np.uint8, mode="r")
+        else:
+            self.blob = np.empty(0, dtype=np.uint8)
+
+    def values(self, attr_id: int):
+        """
+        :return: a read-only view of the attribute values, or the plain list for
+                 attributes stored inline (e.g. string)
+        """
+        attr = self.attributes[attr_id]
+        values = attr["__data__"]["values"]
+        if not isinstance(values, dict):
+            return values
+        dtype, shape = _column_layout(attr["__meta__"]["type"])
+        shape = (values["count"],) + shape
+        begin = values["offset"]
+        return self.blob[begin:begin + dtype.itemsize * int(np.prod(shape))].view(dtype).reshape(shape)
+
+    def to_dict(self):
+        """
+        :return: the scene as SceneIO json, e.g. for SceneIO.from_json
+        """
+        attributes = []
+        # copies share their column, convert it once
+        converted = {}
+        for i, attr in enumerate(self.attributes):
+            data = dict(attr["__data__"])
+            if isinstance(data["values"], dict):
+                key = (data["values"]["offset"], data["values"]["count"], attr["__meta__"]["type"])
+                if key not in converted:
+                    converted[key] = array_to_values(attr["__meta__"]["type"], self.values(i))
+                data["values"] = converted[key]
+            attributes.append({"__data__": data, "__meta__": attr["__meta__"]})
+        atlas = self.scene_dict["__data__"]["geometry_atlas"]["__data__"]
+        atlas = dict(atlas, attributes=attributes)
+        geometry_atlas = dict(self.scene_dict["__data__"]["geometry_atlas"], __data__=atlas)
+        data = dict(self.scene_dict["__data__"], geometry_atlas=geometry_atlas)
+        return dict(self.scene_dict, __data__=data)
+
+    def save_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+
+def load_scene(folder):
+    """
+    :return: a uipc Scene built from a columnar scene
+    """
+    from uipc.core import SceneIO
+    return SceneIO.from_json(ColumnarScene(folder).to_dict())
+
+
+if __name__ == "__main__":
+    src, dst = sys.argv[1], sys.argv[2]
+    if pathlib.Path(src).is_dir():
+        ColumnarScene(src).save_json(dst)
+        print(f"Convert {src} -> {dst}")
+    else:
+        columns, distinct = convert(src, dst)
+        print(f"Convert {src} -> {dst}, {columns} columns, {distinct} distinct")
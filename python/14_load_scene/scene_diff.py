@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# @file scene_diff.py
+# @brief Structural diff between two scene.json files
+# ---------------------------------
+#
+#     python scene_diff.py a/scene.json b/scene.json
+#
+# Every item of a scene is hashed in one streaming pass:
+#
+#     object             object label (edit_scene.object_labels), its number of geometries
+#     geometry           "object/n", the n-th geometry of the object, its type and attribute names
+#     attribute          "object/n/collection/attribute", type, default value and values
+#     rest_attribute     the same for the rest geometry of a slot
+#
+# Objects and geometries are keyed by their order, not by id: inserting an object or a
+# geometry shifts the ids of all the later ones, they would all look removed and added.
+#     contact_element    contact tabular entries by id
+#     <collection>       the scene attribute collections, e.g. "config" and "contact_models"
+#
+# then the items are matched by key. Only the changed numeric attributes are read
+# again, to report how many of their values changed and by how much.
+import sys
+import json
+import hashlib
+import argparse as ap
+import numpy as np
+
+from edit_scene import attribute_layout, values_to_array, object_labels
+from scene_stream import SceneStream
+
+
+def _digest(value):
+    text = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+def _attribute_keys(geometry):
+    keys = {}
+    for collection, c in geometry["__data__"].items():
+        # empty attribute collections are stored as null
+        for attr_name, attr in (c["__data__"] or {}).items():
+            keys[f"{collection}/{attr_name}"] = attr["index"]
+    return keys
+
+
+class SceneDigest:
+    """
+    The hash of every item of a scene, computed with bounded memory.
+    items maps (kind, key) to a digest, attributes maps (kind, key) to the attribute index.
+    """
+    def __init__(self, scene_path: str):
+        self.stream = SceneStream(scene_path)
+        attribute_digests = []
+        geometries = {}
+        slots = {}
+        rest_slots = {}
+        objects = []
+        values = {}
+        for kind, path, value in self.stream.events():
+            if kind == "attribute":
+                attribute_digests.append(_digest(value))
+            elif kind == "geometry":
+                # only the attribute indices are kept, not the payloads
+                geometries[path[-1]] = (value["__meta__"]["type"], _attribute_keys(value))
+            elif kind == "geometry_slot":
+                slots[value["id"]] = value["index"]
+            elif kind == "rest_geometry_slot":
+                rest_slots[value["id"]] = value["index"]
+            elif kind == "object":
+                objects.append(value)
+            else:
+                values[path] = value
+
+        self.items = {}
+        self.attributes = {}
+
+        def add_attributes(kind, prefix, keys):
+            for key, attr_id in keys.items():
+                item = (kind, f"{prefix}/{key}" if prefix else key)
+                self.items[item] = attribute_digests[attr_id]
+                self.attributes[item] = attr_id
+
+        for obj, label in zip(objects, object_labels(objects)):
+            self.items[("object", label)] = _digest(len(obj["geometries"]))
+            for n, slot_id in enumerate(obj["geometries"]):
+                geo_type, keys = geometries[slots[slot_id]]
+                prefix = f"{label}/{n}"
+                self.items[("geometry", prefix)] = _digest([geo_type, sorted(keys)])
+                add_attributes("attribute", prefix, keys)
+                if slot_id in rest_slots:
+                    add_attributes("rest_attribute", prefix, geometries[rest_slots[slot_id]][1])
+
+        contact_tabular = values.get(("__data__", "contact_tabular"), {})
+        for element in contact_tabular.get("contact_elements", []):
+            self.items[("contact_element", str(element["id"]))] = _digest(element)
+        collections = values.get(("__data__", "geometry_atlas", "__data__", "attribute_collections"), {})
+        for name, c in collections.items():
+            add_attributes(name, "", {k: v["index"] for k, v in (c["__data__"] or {}).items()})
+
+    def fingerprint(self):
+        """
+        One hash of the whole scene, equal for scenes without differences,
+        e.g. to decide whether cached simulation results can be reused.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        for kind, key in sorted(self.items):
+            h.update(f"{kind}\0{key}\0".encode())
+            h.update(self.items[(kind, key)])
+        return h.hexdigest()
+
+
+def _attribute_change(attr_a, attr_b):
+    # summary of a changed attribute, without dumping its values
+    type_a, type_b = attr_a["__meta__"]["type"], attr_b["__meta__"]["type"]
+    # pairs are (old, new)
+    if type_a != type_b:
+        return {"types": [type_a, type_b]}
+    change = {"type": type_a}
+    if attr_a["__data__"]["default_value"] != attr_b["__data__"]["default_value"]:
+        change["default_values"] = [attr_a["__data__"]["default_value"], attr_b["__data__"]["default_value"]]
+    values_a, values_b = attr_a["__data__"]["values"], attr_b["__data__"]["values"]
+    if values_a == values_b:
+        return change
+    if len(values_a) == 1 and len(values_b) == 1:
+        # a single value, e.g. a config entry, is small enough to show
+        change["values"] = [values_a[0], values_b[0]]
+    if attribute_layout(type_a) is None:
+        change["changed"] = sum(x != y for x, y in zip(values_a, values_b)) + abs(len(values_a) - len(values_b))
+        return change
+    array_a = values_to_array(type_a, values_a)
+    array_b = values_to_array(type_b, values_b)
+    if array_a.shape != array_b.shape:
+        change["shapes"] = [list(array_a.shape), list(array_b.shape)]
+        return change
+    delta = np.abs(array_a.astype(np.float64) - array_b.astype(np.float64)).reshape(len(array_a), -1)
+    change["shape"] = list(array_a.shape)
+    change["changed"] = int(np.count_nonzero(delta.max(axis=1, initial=0) > 0))
+    change["max_abs_delta"] = float(delta.max(initial=0))
+    return change
+
+
+def diff_scenes(path_a: str, path_b: str):
+    """
+    :return: {"added": [(kind, key)], "removed": [(kind, key)], "changed": [(kind, key, details)]}
+    """
+    a = SceneDigest(path_a)
+    b = SceneDigest(path_b)
+    added = sorted(k for k in b.items if k not in a.items)
+    removed = sorted(k for k in a.items if k not in b.items)
+    changed = []
+    # geometries made by mesh.copy() share attributes, summarize each pair once
+    summaries = {}
+    for item in sorted(k for k in a.items if k in b.items and a.items[k] != b.items[k]):
+        details = {}
+        if item in a.attributes:
+            pair = (a.attributes[item], b.attributes[item])
+            if pair not in summaries:
+                summaries[pair] = _attribute_change(a.stream.attribute(pair[0]), b.stream.attribute(pair[1]))
+            details = summaries[pair]
+        changed.append(item + (details,))
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def _format_details(details):
+    parts = []
+    for key in ("types", "shapes", "default_values", "values"):
+        if key in details:
+            old, new = details[key]
+            parts.append(f"{key[:-1]} {json.dumps(old)} -> {json.dumps(new)}")
+    if "changed" in details:
+        parts.append(f"{details['changed']} of {details['shape'][0]} changed" if "shape" in details else f"{details['changed']} changed")
+    if "max_abs_delta" in details:
+        parts.append(f"max |delta| {details['max_abs_delta']:g}")
+    return ", ".join(parts)
+
+
+def main():
+    parser = ap.ArgumentParser(description="Structural diff between two scene.json files")
+    parser.add_argument("a", type=str, help="The old scene.json")
+    parser.add_argument("b", type=str, help="The new scene.json")
+    parser.add_argument("--json", action="store_true", help="Print the diff as json")
+    args = parser.parse_args()
+
+    diff = diff_scenes(args.a, args.b)
+    if args.json:
+        print(json.dumps(diff, indent=4))
+    else:
+        for kind, key in diff["added"]:
+            print(f"+ {kind} {key}")
+        for kind, key in diff["removed"]:
+            print(f"- {kind} {key}")
+        for kind, key, details in diff["changed"]:
+            print(f"~ {kind} {key} {_format_details(details)}".rstrip())
+    # like diff: 1 if the scenes differ
+    sys.exit(1 if any(diff.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
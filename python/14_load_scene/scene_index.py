@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+# @file scene_index.py
+# @brief Key index over a scene dict, for SceneEdit queries
+# ---------------------------------
+import re
+import numpy as np
+
+# a flat key is the path of a value, joined with '_', e.g.
+# "__data___geometry_atlas___data___attributes_12___data___values_3_0"
+# attribute payloads ("values", "default_value") are indexed by their root key only,
+# their leaves are expanded when a query reaches them
+PAYLOAD_KEYS = ("values", "default_value")
+NGRAM = 3
+_PAYLOAD_TAIL = re.compile(r"[0-9_]*$")
+_LEADING_DIGITS = re.compile(r"[0-9]*")
+
+def iter_flat(x, name=''):
+    """
+    Lazily yield the (key, value) pairs of the flattened x: the keys of nested dicts and
+    the indices of lists joined by "_", e.g. "objects_0_name"
+    """
+    stack = [(x, name)]
+    while stack:
+        x, name = stack.pop()
+        if type(x) is dict:
+            for a in reversed(list(x)):
+                stack.append((x[a], name + a + '_'))
+        elif type(x) is list:
+            for i in range(len(x) - 1, -1, -1):
+                stack.append((x[i], name + str(i) + '_'))
+        else:
+            yield name[:-1], x
+
+def _is_payload(tail):
+    # the path ends with "attributes", i, "__data__", "values"
+    return len(tail) == 4 and tail[3] in PAYLOAD_KEYS and tail[2] == "__data__" and tail[0] == "attributes"
+
+
+class KeyIndex:
+    """
+    A trie over the path segments and an n-gram index over the flat keys of a scene dict.
+    resolve, if given, maps a payload node to its value when a query reaches its leaves,
+    for dicts whose payloads are not decoded yet.
+    """
+    def __init__(self, scene_dict, resolve=None):
+        self.resolve = resolve
+        self.keys = []      # key id -> flat key, in document order
+        self.nodes = []     # key id -> value (a leaf value or a payload root)
+        self.payload = []   # key id -> whether the value is an attribute payload
+        self.trie = {}
+        self._build(scene_dict)
+        self._build_ngrams()
+
+    def _build(self, scene_dict):
+        # (value, flat key, last path segments, trie node)
+        stack = [(scene_dict, None, (), self.trie)]
+        while stack:
+            x, key, tail, node = stack.pop()
+            payload = _is_payload(tail)
+            if not payload and type(x) in (dict, list):
+                items = x.items() if type(x) is dict else enumerate(x)
+                children = []
+                for a, v in items:
+                    a = str(a)
+                    children.append((v, a if key is None else f"{key}_{a}", (tail + (a,))[-4:], node.setdefault(a, {})))
+                stack.extend(reversed(children))
+                continue
+            node["$"] = len(self.keys)
+            self.keys.append("" if key is None else key)
+            self.nodes.append(x)
+            self.payload.append(payload)
+
+    def _build_ngrams(self):
+        # trigram -> sorted key ids, as one sorted array of (trigram, key id) pairs,
+        # computed with numpy over all the keys at once
+        encoded = [k.encode() for k in self.keys]
+        lengths = np.fromiter((len(k) for k in encoded), dtype=np.int64, count=len(encoded))
+        # keys are separated by a 0 byte, trigrams containing it are dropped
+        b = np.frombuffer(b"\0".join(encoded), dtype=np.uint8).astype(np.uint64)
+        key_of_byte = np.repeat(np.arange(len(encoded), dtype=np.uint64), lengths + 1)[:b.size]
+        if b.size < NGRAM:
+            self._gram_codes = np.empty(0, dtype=np.uint64)
+            self._gram_starts = np.empty(1, dtype=np.int64)
+            self._gram_keys = np.empty(0, dtype=np.int64)
+            return
+        codes = (b[:-2] << np.uint64(16)) | (b[1:-1] << np.uint64(8)) | b[2:]
+        valid = (b[:-2] != 0) & (b[1:-1] != 0) & (b[2:] != 0)
+        pairs = (codes[valid] << np.uint64(32)) | key_of_byte[:-2][valid]
+        pairs.sort()
+        pairs = pairs[np.append(True, pairs[1:] != pairs[:-1])]
+        gram_of_pair = pairs >> np.uint64(32)
+        starts = np.flatnonzero(np.append(True, gram_of_pair[1:] != gram_of_pair[:-1]))
+        self._gram_codes = gram_of_pair[starts]
+        self._gram_starts = np.append(starts, pairs.size)
+        self._gram_keys = (pairs & np.uint64(0xffffffff)).astype(np.int64)
+
+    def _posting(self, code):
+        i = np.searchsorted(self._gram_codes, code)
+        if i == self._gram_codes.size or self._gram_codes[i] != code:
+            return None
+        return self._gram_keys[self._gram_starts[i]:self._gram_starts[i + 1]]
+
+    def _leaves(self, key_id):
+        # the (flat key, value) pairs of a key, as iter_flat yields them
+        if self.payload[key_id]:
+            node = self.nodes[key_id]
+            if self.resolve is not None:
+                node = self.resolve(node)
+            yield from iter_flat(node, self.keys[key_id] + "_")
+        else:
+            yield self.keys[key_id], self.nodes[key_id]
+
+    def _candidates(self, s):
+        # ids of the keys that may contain s, by intersecting the n-gram postings
+        b = s.encode()
+        if len(b) < NGRAM:
+            return range(len(self.keys))
+        codes = {(b[i] << 16) | (b[i + 1] << 8) | b[i + 2] for i in range(len(b) - NGRAM + 1)}
+        postings = []
+        for code in codes:
+            posting = self._posting(code)
+            if posting is None:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        ids = postings[0]
+        for posting in postings[1:]:
+            # a few candidates are cheaper to check than more intersections
+            if ids.size <= 16:
+                break
+            ids = np.intersect1d(ids, posting, assume_unique=True)
+        return ids.tolist()
+
+    def search(self, pattern: str):
+        """
+        The (flat key, value) pairs whose key contains pattern, in document order.
+        Only keys sharing all the n-grams of the pattern are looked at.
+        """
+        matched = {}
+        for key_id in self._candidates(pattern):
+            if pattern in self.keys[key_id]:
+                matched[key_id] = None  # every leaf matches
+
+        # the pattern may also run from the end of a payload root key into
+        # the "_i_j" part of its leaves, e.g. "values_3" or "attributes_12___data___values_0_1"
+        tail = len(_PAYLOAD_TAIL.search(pattern).group())
+        if tail:
+            for split in range(len(pattern) - tail, len(pattern)):
+                head = pattern[:split]
+                for key_id in self._candidates(head):
+                    if key_id in matched or not self.payload[key_id]:
+                        continue
+                    if self.keys[key_id].endswith(head):
+                        matched[key_id] = pattern
+
+        result = []
+        for key_id in sorted(matched):
+            if matched[key_id] is None:
+                result.extend(self._leaves(key_id))
+            else:
+                result.extend((k, v) for k, v in self._leaves(key_id) if pattern in k)
+        return result
+
+    def prefix(self, prefix: str):
+        """
+        The (flat key, value) pairs whose key starts with prefix, found by walking the trie.
+        """
+        ids = []
+        self._walk_prefix(self.trie, prefix, True, ids)
+        result = []
+        for key_id in sorted(ids):
+            for k, v in self._leaves(key_id):
+                if k.startswith(prefix):
+                    result.append((k, v))
+        return result
+
+    def _walk_prefix(self, node, rest, first, ids):
+        if not first:
+            # a separator is between this segment and the next one
+            if not rest:
+                self._collect(node, ids)
+                return
+            if rest[0] != "_":
+                return
+            rest = rest[1:]
+        if "$" in node and self.payload[node["$"]]:
+            # the rest of the prefix is inside the payload, checked on its leaves
+            ids.append(node["$"])
+            return
+        if not rest:
+            self._collect(node, ids)
+            return
+        digits = _LEADING_DIGITS.match(rest).group()
+        if digits and len(digits) < len(rest):
+            # list items: only the segments that are a prefix of the index can match
+            for i in range(1, len(digits) + 1):
+                child = node.get(digits[:i])
+                if child is not None:
+                    self._walk_prefix(child, rest[i:], False, ids)
+            return
+        for seg, child in node.items():
+            if seg == "$":
+                continue
+            if seg.startswith(rest):
+                self._collect(child, ids)
+            elif rest.startswith(seg):
+                self._walk_prefix(child, rest[len(seg):], False, ids)
+
+    def _collect(self, node, ids):
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            for seg, child in n.items():
+                if seg == "$":
+                    ids.append(child)
+                else:
+                    stack.append(child)
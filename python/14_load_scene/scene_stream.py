@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+# @file scene_stream.py
+# @brief Streaming reader for large scene.json files
+# ---------------------------------
+import re
+import sys
+import json
+import codecs
+from array import array
+
+# the arrays of a scene that are streamed element by element,
+# everything else is small and decoded as a whole
+STREAMED = {
+    ("__data__", "geometry_atlas", "__data__", "geometries"): "geometry",
+    ("__data__", "geometry_atlas", "__data__", "attributes"): "attribute",
+    ("__data__", "geometry_slots"): "geometry_slot",
+    ("__data__", "rest_geometry_slots"): "rest_geometry_slot",
+    ("__data__", "object_collection", "objects"): "object",
+}
+# the objects to descend into on the way to the streamed arrays
+_DESCEND = {path[:i] for path in STREAMED for i in range(len(path))}
+_SPACE = re.compile(r"\s*")
+
+
+def assign(root, kind, path, value):
+    """
+    Put a value of SceneStream.events() at its path in root, the elements of the
+    streamed arrays are appended in order. Rebuilds the document from its events.
+    """
+    element = kind != "value"
+    node = root
+    for key in path[:-2 if element else -1]:
+        node = node.setdefault(key, {})
+    if element:
+        node.setdefault(path[-2], []).append(value)
+    else:
+        node[path[-1]] = value
+
+
+def add_empty_arrays(root):
+    # empty streamed arrays yield no elements, but are still part of the scene
+    for path in STREAMED:
+        node = root
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node.setdefault(path[-1], [])
+
+
+class _Reader:
+    """
+    A JSON text read from a binary file in chunks. Values are decoded with
+    json.JSONDecoder.raw_decode on the buffer, which is refilled when a value
+    runs past its end, so only about one value is held at a time.
+    """
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.base = f.tell()  # byte offset of buf[0]
+        self.eof = False
+        self.ascii = True
+
+    def _fill(self, size=0):
+        # drop the consumed text, then read at least size more bytes
+        consumed = self.buf[:self.pos]
+        self.base += len(consumed) if consumed.isascii() else len(consumed.encode())
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        data = self.f.read(max(size, self.chunk_size))
+        self.eof = not data
+        self.buf += self.utf8.decode(data, final=self.eof)
+        # scene files are usually pure ascii, then chars and bytes line up
+        self.ascii = self.buf.isascii()
+
+    def offset(self):
+        # byte offset of the next value in the file
+        if self.ascii:
+            return self.base + self.pos
+        return self.base + len(self.buf[:self.pos].encode())
+
+    def peek(self):
+        while True:
+            self.pos = _SPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                raise ValueError("unexpected end of the scene file")
+            self._fill()
+
+    def expect(self, c):
+        if self.peek() != c:
+            raise ValueError(f"expected '{c}' at byte {self.offset()}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                v, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                # the value is not complete yet, double the buffer
+                self._fill(len(self.buf))
+                continue
+            if end == len(self.buf) and not self.eof:
+                # a number may go on in the next chunk
+                self._fill()
+                continue
+            self.pos = end
+            return v
+
+
+class _Offsets:
+    # byte offsets recorded while streaming
+    def __init__(self):
+        # attribute index -> byte offset of its first and one past its last byte
+        self.begins = array("q")
+        self.ends = array("q")
+        # path of a streamed array -> (byte offset of "[", one past "]")
+        self.arrays = {}
+
+
+class SceneStream:
+    """
+    Event-driven reader of a scene.json written by SceneIO.
+
+    The geometries, attributes, geometry slots and objects are decoded one at a
+    time, the memory needed is bounded by the largest single element instead of
+    the whole document, e.g.
+
+        stream = SceneStream("scene.json")
+        for i, geometry in stream.geometries():
+            ...
+    """
+    def __init__(self, scene_path: str, chunk_size: int = 1 << 20):
+        self.scene_path = scene_path
+        self.chunk_size = chunk_size
+        # attribute index -> byte offset in the file, recorded while streaming
+        self.attribute_offsets = None
+        # attribute index -> byte offset one past its end, after a full pass over events()
+        self.attribute_ends = None
+        # path of a streamed array -> (byte offset of "[", one past "]"), the same
+        self.array_spans = None
+
+    def events(self):
+        """
+        Walk the document, yielding (kind, path, value):
+
+        - kind is "geometry", "attribute", "geometry_slot", "rest_geometry_slot" or "object"
+          for the elements of the streamed arrays, path ends with their index
+        - kind is "value" for any other member, decoded as a whole
+        """
+        offsets = _Offsets()
+        with open(self.scene_path, "rb") as f:
+            reader = _Reader(f, self.chunk_size)
+            yield from self._object(reader, (), offsets)
+        self.attribute_offsets = offsets.begins
+        self.attribute_ends = offsets.ends
+        self.array_spans = offsets.arrays
+
+    def _object(self, reader, path, offsets):
+        reader.expect("{")
+        if reader.peek() == "}":
+            reader.pos += 1
+            return
+        while True:
+            key = reader.value()
+            reader.expect(":")
+            member = path + (key,)
+            kind = STREAMED.get(member)
+            if kind is not None:
+                yield from self._array(reader, member, kind, offsets)
+            elif member in _DESCEND and reader.peek() == "{":
+                yield from self._object(reader, member, offsets)
+            else:
+                yield "value", member, reader.value()
+            c = reader.peek()
+            reader.pos += 1
+            if c == "}":
+                return
+            if c != ",":
+                raise ValueError(f"expected ',' or '}}' at byte {reader.offset() - 1}")
+
+    def _array(self, reader, path, kind, offsets):
+        reader.peek()
+        begin = reader.offset()
+        reader.expect("[")
+        if reader.peek() == "]":
+            reader.pos += 1
+            offsets.arrays[path] = (begin, reader.offset())
+            return
+        i = 0
+        while True:
+            if kind == "attribute":
+                reader.peek()
+                offsets.begins.append(reader.offset())
+            value = reader.value()
+            if kind == "attribute":
+                offsets.ends.append(reader.offset())
+            yield kind, path + (i,), value
+            i += 1
+            c = reader.peek()
+            reader.pos += 1
+            if c == "]":
+                offsets.arrays[path] = (begin, reader.offset())
+                return
+            if c != ",":
+                raise ValueError(f"expected ',' or ']' at byte {reader.offset() - 1}")
+
+    def _elements(self, kind):
+        for k, path, value in self.events():
+            if k == kind:
+                yield path[-1], value
+
+    def geometries(self):
+        """
+        :return: an iterator of (geometry index, geometry)
+        """
+        return self._elements("geometry")
+
+    def attributes(self):
+        """
+        :return: an iterator of (attribute index, attribute)
+        """
+        return self._elements("attribute")
+
+    def objects(self):
+        """
+        :return: an iterator of objects, {"geometries": [slot ids], "id", "name"}
+        """
+        for _, obj in self._elements("object"):
+            yield obj
+
+    def _index_attributes(self):
+        # one pass to find where every attribute starts, stopped right after the attributes
+        offsets = _Offsets()
+        with open(self.scene_path, "rb") as f:
+            reader = _Reader(f, self.chunk_size)
+            seen = False
+            for kind, _, _ in self._object(reader, (), offsets):
+                if kind == "attribute":
+                    seen = True
+                elif seen:
+                    break
+        self.attribute_offsets = offsets.begins
+
+    def attribute(self, attr_id: int):
+        """
+        Read one attribute by seeking to it, the attributes are indexed on the first call
+        (or by a previous full pass over events()).
+        """
+        if self.attribute_offsets is None:
+            self._index_attributes()
+        with open(self.scene_path, "rb") as f:
+            f.seek(self.attribute_offsets[attr_id])
+            return _Reader(f, self.chunk_size).value()
+
+    def geometry_attributes(self, geometry):
+        """
+        :return: {"collection/attribute": attribute} of a geometry yielded by geometries()
+        """
+        result = {}
+        for collection, c in geometry["__data__"].items():
+            # empty attribute collections are stored as null
+            for attr_name, attr in (c["__data__"] or {}).items():
+                result[f"{collection}/{attr_name}"] = self.attribute(attr["index"])
+        return result
+
+
+if __name__ == "__main__":
+    from asset_dir import AssetDir
+    scene_path = sys.argv[1] if len(sys.argv) > 1 else f"{AssetDir.folder(__file__)}/scene.json"
+    stream = SceneStream(scene_path)
+    counts = {}
+    for kind, path, value in stream.events():
+        counts[kind] = counts.get(kind, 0) + 1
+        if kind == "geometry":
+            print(f"Geometry {path[-1]}: {value['__meta__']['type']}")
+        elif kind == "object":
+            print(f"Object {value['name']}: slots {value['geometries']}")
+    for kind, n in counts.items():
+        print(f"{kind}: {n}")
@@ -1,3 +1,4 @@
+import time
 import numpy as np
 import polyscope as ps
 from polyscope import imgui
@@ -12,20 +13,41 @@ from uipc.constitution import AffineBodyConstitution, StableNeoHookean
 from uipc.gui import SceneGUI
 from uipc.unit import MPa, GPa
 from asset_dir import AssetDir
-import pathlib as pl
+from commit_log import CommitLog, load_frame, KEYFRAME
+from commit_consumer import CommitConsumer, StreamConsumer, apply_decoded
 
 Logger.set_level(Logger.Level.Warn)
 
 this_folder = AssetDir.folder(__file__)
 output_path = AssetDir.output_path(this_folder)
 
-# --------------------------------------------------------
-# load from bson (binary json)
-scene = SceneIO.load(f'{output_path}/scene/scene0.bson')
-# OR use:
-# SceneIO.from_json(...)
-# to load the scene from a json
-# --------------------------------------------------------
+# receive the commits from the stream_address of server_run.py instead of the
+# files, e.g. ('server', 9090), when the viewer runs on another machine
+stream_address = None
+commit_log = None
+
+if(stream_address is None):
+    # --------------------------------------------------------
+    # load from bson (binary json)
+    scene = SceneIO.load(f'{output_path}/scene/scene0.bson')
+    # OR use:
+    # SceneIO.from_json(...)
+    # to load the scene from a json
+    # --------------------------------------------------------
+
+    # the commits written by server_run.py, the log is mapped and followed while it grows
+    log_path = f'{output_path}/scene/commits.log'
+    commit_log = CommitLog(log_path)
+    # decodes the next 8 frames on a worker thread, woken by inotify when the server writes,
+    # the GUI callback only takes one decoded frame and applies it
+    consumer = CommitConsumer(log_path, frame=1, depth=8)
+else:
+    # receives and decodes up to 8 frames ahead on a worker thread, the stream
+    # reconnects on its own if the connection drops
+    consumer = StreamConsumer(stream_address, depth=8)
+    # the first record is a keyframe
+    _, _, data = consumer.pop(timeout=None)
+    scene = SceneIO.from_json(data)
 
 scene_io = SceneIO(scene)
 sgui = SceneGUI(scene, 'split')
@@ -34,33 +56,61 @@ ps.init()
 sgui.register()
 sgui.set_edge_width(1)
 
+def show(new_scene):
+    # show another scene instead
+    global scene, scene_io, sgui
+    scene = new_scene
+    scene_io = SceneIO(scene)
+    ps.remove_all_structures()
+    sgui = SceneGUI(scene, 'split')
+    sgui.register()
+    sgui.set_edge_width(1)
+
 run = False
 frame = 1
+seek_frame = 0
 def on_update():
     global run
     global frame
-    
-    path = f'{output_path}/scene/scene{frame}.bson'
+    global seek_frame
     
     if(imgui.Button('run & stop')):
         run = not run
-    
-    if(not pl.Path(path).exists()):
-        run = False
+
+    # jump to any frame: nearest keyframe + the commits after it
+    if(commit_log is not None):
+        _, seek_frame = imgui.SliderInt('frame', seek_frame, 0, consumer.last_frame)
+    if(commit_log is not None and imgui.Button('seek')):
+        t = time.perf_counter()
+        commit_log.refresh()
+        new_scene, _ = load_frame(commit_log, seek_frame)
+        show(new_scene)
+        print(f'seek to frame {seek_frame} in {(time.perf_counter() - t) * 1000:.1f} ms')
+        frame = seek_frame + 1
+        consumer.seek(frame)
 
     if(run):
-        print(f'load update from {path}')
-        
-        # -----------------------------------------
-        # update from the scene commit files
-        scene_io.update(path)
-        
-        # OR use:
-        # scene_io.update_from_json(...)
         # -----------------------------------------
-        
-        sgui.update()
-        frame += 1
+        # update from the scene commit log, at most one
+        # already decoded frame per GUI frame, never waits
+        item = consumer.pop()
+        if(item is not None):
+            frame, kind, data = item
+            print(f'load update of frame {frame}')
+            if(kind == KEYFRAME):
+                # the geometries changed, only the keyframe has this frame
+                show(SceneIO.from_json(data))
+            else:
+                apply_decoded(kind, data, scene, scene_io)
+
+            # OR use:
+            # scene_io.update(f'{output_path}/scene/scene{frame}.bson')
+            # to update from one file per frame
+            # -----------------------------------------
+
+            sgui.update()
+            frame += 1
 
 ps.set_user_callback(on_update)
-ps.show()
\ No newline at end of file
+ps.show()
+consumer.close()
\ No newline at end of file
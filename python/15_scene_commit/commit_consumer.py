@@ -0,0 +1,304 @@
+'''
+Prefetching consumer of a commit log, so that the GUI never waits on the disk or a decode.
+
+A worker thread follows the log: it waits for the server to write (inotify on the log's
+folder, or a poll every poll_interval where inotify is not available), maps the new
+records and decodes the next frames, json or ATTRIBUTES arrays, into a queue of at most
+`depth` frames. The GUI takes at most one decoded frame per callback with pop(), which
+never blocks, and applies it with apply_decoded().
+
+    consumer = CommitConsumer(log_path, frame=1, depth=8)
+    ...
+    item = consumer.pop()       # in the GUI callback
+    if(item is not None):
+        frame, kind, data = item
+        apply_decoded(kind, data, scene, scene_io)
+'''
+import os
+import json
+import time
+import queue
+import select
+import ctypes
+import ctypes.util
+import threading
+
+from commit_log import CommitLog, COMMIT, KEYFRAME, ATTRIBUTES, QUANTIZED
+from incremental_snapshot import decode_attributes, apply_entries
+from quantized_commit import decode_quantized, apply_quantized_entries
+from commit_stream import CommitStreamClient
+
+# inotify(7)
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+class DirectoryWatcher:
+    '''
+    Waits for files of a folder to be created or written. Uses inotify where libc has it,
+    otherwise wait() only sleeps and the caller checks for itself, i.e. polls.
+    '''
+    def __init__(self, folder):
+        self.fd = None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return
+        if fd < 0:
+            return
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(fd, os.fsencode(folder), mask) < 0:
+            os.close(fd)
+            return
+        self.fd = fd
+
+    @property
+    def inotify(self):
+        return self.fd is not None
+
+    def wait(self, timeout):
+        '''
+        Wait until something in the folder changed or the timeout passed.
+        '''
+        if self.fd is None:
+            threading.Event().wait(timeout)
+            return
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            # drop the events, the caller refreshes whatever changed
+            try:
+                while os.read(self.fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+def decode_record(kind, payload):
+    '''
+    :return: the parsed json of a COMMIT or a KEYFRAME, the entries of an ATTRIBUTES or a QUANTIZED commit
+    '''
+    if kind == ATTRIBUTES:
+        return decode_attributes(payload)
+    if kind == QUANTIZED:
+        return decode_quantized(payload)
+    return json.loads(bytes(payload))
+
+def decode_frame(commit_log, frame):
+    '''
+    :return: (kind, data) of a frame, see decode_record; None if the log has no record of the frame yet
+    '''
+    if frame in commit_log:
+        kind = commit_log.kind(frame)
+        return kind, decode_record(kind, commit_log.record(frame))
+    if frame in commit_log.keyframes:
+        # the geometries changed, only the keyframe has this frame
+        return KEYFRAME, decode_record(KEYFRAME, commit_log.record(frame, KEYFRAME))
+    return None
+
+def apply_decoded(kind, data, scene, scene_io):
+    '''
+    Apply a frame from decode_frame to a scene. A KEYFRAME is a whole scene, it cannot be
+    applied in place: build a new one with SceneIO.from_json(data) instead.
+    '''
+    if kind == ATTRIBUTES:
+        apply_entries(scene, data)
+    elif kind == QUANTIZED:
+        apply_quantized_entries(scene, data)
+    elif kind == COMMIT:
+        scene_io.update_from_json(data)
+    else:
+        raise ValueError('a keyframe replaces the scene, load it with SceneIO.from_json')
+
+class CommitConsumer:
+    '''
+    Decodes the frames of a commit log ahead of the GUI on a worker thread, see the module.
+    The log does not need to exist yet, the consumer waits for the server to create it.
+    '''
+    def __init__(self, path, frame=1, depth=8, poll_interval=0.05):
+        '''
+        :param frame: the first frame to decode
+        :param depth: frames decoded ahead at most
+        :param poll_interval: seconds between checks of the log without inotify,
+                              and at most between checks for close()
+        '''
+        self.path = path
+        self.poll_interval = poll_interval
+        self.ready = queue.Queue(maxsize=depth)
+        self.lock = threading.Lock()
+        # seek() bumps the generation, frames decoded for an older one are dropped
+        self.generation = 0
+        self.next_frame = frame
+        # the last frame in the log, commit or keyframe, for a slider
+        self.last_frame = 0
+        self.error = None
+        self.stopped = threading.Event()
+        self.watcher = DirectoryWatcher(os.path.dirname(os.path.abspath(path)))
+        self.thread = threading.Thread(target=self._run, name='commit-consumer', daemon=True)
+        self.thread.start()
+
+    def _open(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            return CommitLog(self.path)
+        except Exception:
+            # the writer has not written the header yet
+            return None
+
+    def _run(self):
+        commit_log = None
+        try:
+            while not self.stopped.is_set():
+                if commit_log is None:
+                    commit_log = self._open()
+                if commit_log is not None and os.path.getsize(self.path) < commit_log.size:
+                    # the server started a new log (reset) over the old one
+                    commit_log.close()
+                    commit_log = self._open()
+                if commit_log is not None:
+                    commit_log.refresh()
+                    self.last_frame = commit_log.last_frame
+                    if self._prefetch(commit_log):
+                        continue
+                self.watcher.wait(self.poll_interval)
+        except Exception as e:
+            self.error = e
+        finally:
+            if commit_log is not None:
+                commit_log.close()
+
+    def _prefetch(self, commit_log):
+        # decode the next frame into the queue, False if it is not in the log yet
+        with self.lock:
+            generation, frame = self.generation, self.next_frame
+        item = decode_frame(commit_log, frame)
+        if item is None:
+            return False
+        kind, data = item
+        while not self.stopped.is_set():
+            if self.generation != generation:
+                return True
+            try:
+                # the queue is full while the GUI is `depth` frames behind, that is the backpressure
+                self.ready.put((generation, frame, kind, data), timeout=self.poll_interval)
+                break
+            except queue.Full:
+                pass
+        with self.lock:
+            if self.generation == generation:
+                self.next_frame = frame + 1
+        return True
+
+    def pop(self):
+        '''
+        :return: (frame, kind, data) of the next decoded frame, None if it is not ready; never waits
+        '''
+        if self.error is not None:
+            raise RuntimeError(f'reading {self.path} failed') from self.error
+        while True:
+            try:
+                generation, frame, kind, data = self.ready.get_nowait()
+            except queue.Empty:
+                return None
+            if generation == self.generation:
+                return frame, kind, data
+
+    def seek(self, frame):
+        '''
+        Continue decoding from frame, e.g. after the GUI loaded another frame.
+        '''
+        with self.lock:
+            self.generation += 1
+            self.next_frame = frame
+        while True:
+            try:
+                self.ready.get_nowait()
+            except queue.Empty:
+                break
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+        self.watcher.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class StreamConsumer:
+    '''
+    Receives and decodes the records of a CommitStreamServer on a worker thread, like
+    CommitConsumer does for a log: connecting, waiting for a record and decoding it never
+    happen in the GUI callback. The queue of at most `depth` decoded frames is the
+    backpressure, the worker only takes a record (and returns its credit) when it has room.
+    '''
+    def __init__(self, address, depth=8, poll_interval=0.05):
+        '''
+        :param address: of the server, see CommitStreamClient
+        :param poll_interval: seconds at most between checks for close()
+        '''
+        self.address = address
+        self.poll_interval = poll_interval
+        self.client = CommitStreamClient(address, credits=depth)
+        self.ready = queue.Queue(maxsize=depth)
+        self.error = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='stream-consumer', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            while not self.stopped.is_set():
+                record = self.client.recv(timeout=self.poll_interval)
+                if record is None:
+                    continue
+                frame, kind, payload = record
+                item = (frame, kind, decode_record(kind, payload))
+                while not self.stopped.is_set():
+                    try:
+                        self.ready.put(item, timeout=self.poll_interval)
+                        break
+                    except queue.Full:
+                        pass
+        except Exception as e:
+            self.error = e
+        finally:
+            self.client.close()
+
+    def pop(self, timeout=0.0):
+        '''
+        :param timeout: seconds to wait for a frame, None waits until one arrives; 0 never waits
+        :return: (frame, kind, data) of the next decoded frame, None if there is none in time
+        '''
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            if self.error is not None:
+                raise RuntimeError(f'receiving from {self.address} failed') from self.error
+            remaining = self.poll_interval if deadline is None else min(self.poll_interval, deadline - time.perf_counter())
+            try:
+                if remaining <= 0:
+                    return self.ready.get_nowait()
+                return self.ready.get(timeout=remaining)
+            except queue.Empty:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return None
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,331 @@
+'''
+Append-only log of scene commits, one file for all the frames instead of one file per frame.
+
+Layout (little endian):
+
+    commits.log      header, 16 bytes: magic b'UIPCCLOG', u32 version, u32 zero
+                     records: u64 frame, u64 payload size, u32 kind, u32 crc32 of the payload, payload
+    commits.log.idx  u64 frame, u64 record offset per record, in the order of the log
+
+The payload of a commit is the compact json of SceneIO.commit_to_json, the payload of
+a keyframe the compact json of SceneIO.to_json, the full scene after that frame. Any
+frame can be reached from the keyframe before it and the commits in between. A commit can
+also be an ATTRIBUTES record of incremental_snapshot.py, the attributes that changed, or a
+QUANTIZED record of quantized_commit.py, the same within an error bound. The index is
+only an accelerator, it is rebuilt from the log if it is missing or behind, and a
+record cut short by a crash is dropped (and overwritten by the next writer).
+'''
+import os
+import mmap
+import time
+import queue
+import bisect
+import json
+import zlib
+import struct
+import threading
+import numpy as np
+
+_MAGIC = b'UIPCCLOG'
+_VERSION = 1
+_HEADER = struct.Struct('<8sII')
+_RECORD = struct.Struct('<QQII')
+_INDEX_DTYPE = np.dtype([('frame', '<u8'), ('offset', '<u8')])
+
+# record kinds
+COMMIT = 1
+KEYFRAME = 2
+ATTRIBUTES = 3
+QUANTIZED = 4
+
+def index_path(path):
+    return f'{path}.idx'
+
+def encode_json(j):
+    # SceneIO returns the json as python objects
+    return json.dumps(j, separators=(',', ':')).encode()
+
+def _scan(buf, begin, end):
+    # (frame, offset) of the complete records in buf[begin:end]
+    entries = []
+    offset = begin
+    while offset + _RECORD.size <= end:
+        frame, size, kind, crc = _RECORD.unpack_from(buf, offset)
+        payload_end = offset + _RECORD.size + size
+        if payload_end > end or zlib.crc32(buf[offset + _RECORD.size:payload_end]) != crc:
+            break
+        entries.append((frame, offset))
+        offset = payload_end
+    return entries, offset
+
+class CommitLogWriter:
+    '''
+    Appends records to a commit log, creating it if needed.
+
+        with CommitLogWriter(path) as log:
+            log.append_json(frame, scene_io.commit_to_json(ss))
+    '''
+    def __init__(self, path, fsync=False, reset=False):
+        '''
+        :param fsync: fsync after every record, not only flush
+        :param reset: start a new log even if there is one
+        '''
+        self.path = path
+        self.fsync = fsync
+        new = reset or not os.path.exists(path) or os.path.getsize(path) < _HEADER.size
+        self.f = open(path, 'wb' if new else 'r+b')
+        if new:
+            self.f.write(_HEADER.pack(_MAGIC, _VERSION, 0))
+            self.end = _HEADER.size
+            entries = []
+        else:
+            magic, version, _ = _HEADER.unpack(self.f.read(_HEADER.size))
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f'{path} is not a version {_VERSION} commit log')
+            with mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                entries, self.end = _scan(buf, _HEADER.size, len(buf))
+            # drop a partly written record
+            self.f.truncate(self.end)
+        self.f.seek(self.end)
+        # the index is rewritten from the log, it is small
+        self.index = open(index_path(path), 'wb')
+        self.index.write(np.array(entries, dtype=_INDEX_DTYPE).tobytes())
+        self.records = set()
+        if entries:
+            with mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                self.records = {(frame, _RECORD.unpack_from(buf, offset)[2]) for frame, offset in entries}
+
+    def append(self, frame, payload, kind=COMMIT):
+        if (frame, kind) in self.records:
+            raise ValueError(f'frame {frame} is already in {self.path}')
+        header = _RECORD.pack(frame, len(payload), kind, zlib.crc32(payload))
+        self.f.write(header)
+        self.f.write(payload)
+        self.f.flush()
+        if self.fsync:
+            os.fsync(self.f.fileno())
+        # the index entry goes last, a reader never sees an entry for a missing record
+        self.index.write(np.array([(frame, self.end)], dtype=_INDEX_DTYPE).tobytes())
+        self.index.flush()
+        self.end += len(header) + len(payload)
+        self.records.add((frame, kind))
+
+    def append_json(self, frame, j, kind=COMMIT):
+        self.append(frame, encode_json(j), kind)
+
+    def close(self):
+        self.f.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class AsyncCommitLogWriter:
+    '''
+    A CommitLogWriter on a worker thread: append_json() only queues the json, encoding
+    and file I/O happen on the worker. The queue holds at most `depth` records, when it
+    is full append_json() waits (backpressure) instead of buffering without bound.
+    An error on the worker is raised by the next append_json() or close().
+
+    Only the I/O is asynchronous: whatever produces the json, e.g. SceneIO.commit_to_json
+    and the SceneSnapshot for the next diff, still runs on the calling thread, they read the
+    scene and must run between retrieve() and the next advance().
+    '''
+    def __init__(self, path, depth=8, fsync=False, reset=False):
+        self.writer = CommitLogWriter(path, fsync=fsync, reset=reset)
+        self.queue = queue.Queue(maxsize=depth)
+        self.error = None
+        # seconds append_json() spent waiting for a free slot
+        self.wait_time = 0.0
+        self.thread = threading.Thread(target=self._run, name='commit-log-writer', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is None:
+                frame, data, kind, encode = item
+                try:
+                    self.writer.append(frame, encode(data) if encode else data, kind)
+                except Exception as e:
+                    self.error = e
+
+    def _check(self):
+        if self.error is not None:
+            raise RuntimeError(f'writing {self.writer.path} failed') from self.error
+
+    def _put(self, item):
+        self._check()
+        t = time.perf_counter()
+        self.queue.put(item)
+        self.wait_time += time.perf_counter() - t
+
+    def append(self, frame, payload, kind=COMMIT):
+        self._put((frame, payload, kind, None))
+
+    def append_json(self, frame, j, kind=COMMIT):
+        self._put((frame, j, kind, encode_json))
+
+    def close(self):
+        '''
+        Wait until everything queued is written, then close the log.
+        '''
+        self.queue.put(None)
+        self.thread.join()
+        self.writer.close()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class CommitLog:
+    '''
+    Reads a commit log through mmap. refresh() picks up the records appended since,
+    so a client can follow a log that is still being written.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, 'rb')
+        magic, version, _ = _HEADER.unpack(self.f.read(_HEADER.size))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f'{path} is not a version {_VERSION} commit log')
+        self.buf = None
+        self.size = 0
+        self.end = _HEADER.size
+        # frame -> record offset, per kind
+        self.offsets = {}
+        self.keyframes = {}
+        # the keyframe frames in ascending order, for seek_plan
+        self.keyframe_list = []
+        # the last frame in the log, commit or keyframe, 0 while it is empty
+        self.last_frame = 0
+        self.indexed = 0
+        self.refresh()
+
+    def refresh(self):
+        '''
+        Map the records appended since the last call, return the number of new records.
+        '''
+        size = os.fstat(self.f.fileno()).st_size
+        if size == self.size:
+            return 0
+        # the old map is released with the last payload view into it
+        self.buf = mmap.mmap(self.f.fileno(), size, access=mmap.ACCESS_READ)
+        self.size = size
+        count = self.indexed
+        # trust the index for the records it covers, scan the log for the rest
+        entries = self._read_index()
+        if entries is not None:
+            for frame, offset in entries[self.indexed:].tolist():
+                if offset < self.end:
+                    continue
+                # the index may be ahead of the size mapped above, the writer appends meanwhile
+                if offset + _RECORD.size > size:
+                    break
+                _, record_size, _, _ = _RECORD.unpack_from(self.buf, offset)
+                if offset + _RECORD.size + record_size > size:
+                    break
+                self._add(frame, offset)
+                self.end = offset + _RECORD.size + record_size
+        entries, self.end = _scan(self.buf, self.end, size)
+        for frame, offset in entries:
+            self._add(frame, offset)
+        return self.indexed - count
+
+    def _read_index(self):
+        # the (frame, offset) entries of the index file, None if there is none
+        path = index_path(self.path)
+        if not os.path.exists(path):
+            return None
+        return np.fromfile(path, dtype=_INDEX_DTYPE)
+
+    def _add(self, frame, offset):
+        kind = _RECORD.unpack_from(self.buf, offset)[2]
+        if kind == KEYFRAME:
+            self.keyframes[frame] = offset
+            bisect.insort(self.keyframe_list, frame)
+        else:
+            self.offsets[frame] = offset
+        self.last_frame = max(self.last_frame, frame)
+        self.indexed += 1
+
+    def frames(self):
+        return sorted(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, frame):
+        return frame in self.offsets
+
+    def record(self, frame, kind=COMMIT):
+        '''
+        :return: the payload of a frame's commit or keyframe, a memoryview of the mapped log
+        '''
+        offset = (self.keyframes if kind == KEYFRAME else self.offsets)[frame]
+        size = _RECORD.unpack_from(self.buf, offset)[1]
+        begin = offset + _RECORD.size
+        return memoryview(self.buf)[begin:begin + size]
+
+    def kind(self, frame):
+        '''
+        :return: the kind of a frame's commit, COMMIT, ATTRIBUTES or QUANTIZED
+        '''
+        return _RECORD.unpack_from(self.buf, self.offsets[frame])[2]
+
+    def json(self, frame, kind=COMMIT):
+        return json.loads(bytes(self.record(frame, kind)))
+
+    def seek_plan(self, frame):
+        '''
+        :return: (keyframe, commits), the last keyframe at or before frame and the
+                 frames of the commits to apply on top of it to reach frame
+        '''
+        i = bisect.bisect_right(self.keyframe_list, frame)
+        if i == 0:
+            raise KeyError(f'no keyframe at or before frame {frame}')
+        keyframe = self.keyframe_list[i - 1]
+        commits = list(range(keyframe + 1, frame + 1))
+        missing = [f for f in commits if f not in self.offsets]
+        if missing:
+            raise KeyError(f'commits {missing[:5]} are not in the log')
+        return keyframe, commits
+
+    def close(self):
+        self.buf = None
+        self.f.close()
+
+def load_frame(commit_log, frame):
+    '''
+    Seek: build the scene of a frame from its keyframe and at most the keyframe spacing of commits.
+
+    :return: (scene, scene_io)
+    '''
+    from uipc.core import SceneIO
+    keyframe, commits = commit_log.seek_plan(frame)
+    scene = SceneIO.from_json(commit_log.json(keyframe, KEYFRAME))
+    scene_io = SceneIO(scene)
+    for f in commits:
+        apply_commit(commit_log, f, scene, scene_io)
+    return scene, scene_io
+
+def apply_commit(commit_log, frame, scene, scene_io):
+    '''
+    Apply the commit of a frame, whatever its kind.
+    '''
+    if commit_log.kind(frame) == ATTRIBUTES:
+        from incremental_snapshot import apply_attributes
+        apply_attributes(scene, commit_log.record(frame))
+    elif commit_log.kind(frame) == QUANTIZED:
+        from quantized_commit import apply_quantized
+        apply_quantized(scene, commit_log.record(frame))
+    else:
+        scene_io.update_from_json(commit_log.json(frame))
@@ -0,0 +1,357 @@
+'''
+Streams scene commits over a socket, TCP or a Unix domain socket, instead of files.
+
+Every message is a 24 byte header and a payload (little endian):
+
+    u32 type, u32 arg, u64 frame, u64 payload size, payload
+
+    HELLO   client -> server  arg: credits, frame: the first frame the client needs,
+                              NO_FRAME for a client without a scene; payload: MAGIC
+    CREDIT  client -> server  arg: credits returned
+    RECORD  server -> client  arg: record kind of commit_log.py, frame, payload: the
+                              commit_to_json / ATTRIBUTES / keyframe payload
+
+Backpressure is credit based: the server sends a record only for a credit, the client
+grants `credits` in HELLO and returns one for every record it has taken, so at most
+`credits` records are in flight and a slow viewer never fills the server's memory with
+socket buffers. The server keeps the records since the last keep_keyframes keyframes.
+A client that reconnects asks for the frame after the last one it has and continues
+from there if the server still has its commit, from the last keyframe otherwise; a
+client that falls behind the kept records also jumps to the oldest keyframe kept.
+
+    server = CommitStreamServer(('0.0.0.0', 9090))
+    server.publish(frame, payload, kind)
+
+    client = CommitStreamClient(('server', 9090))
+    frame, kind, payload = client.recv()
+
+The client blocks while a record arrives, up to `timeout` per stall: in a GUI, receive
+on a worker thread with commit_consumer.StreamConsumer.
+
+Run this file to check a loopback connection.
+'''
+import os
+import time
+import socket
+import select
+import struct
+import argparse as ap
+import threading
+
+from commit_log import COMMIT, KEYFRAME, encode_json
+
+MAGIC = b'UIPCCSTR'
+_MESSAGE = struct.Struct('<IIQQ')
+HELLO = 1
+CREDIT = 2
+RECORD = 3
+NO_FRAME = 2**64 - 1
+
+def _family(address):
+    # a (host, port) pair is TCP, a path a Unix domain socket
+    return socket.AF_UNIX if isinstance(address, (str, bytes, os.PathLike)) else socket.AF_INET
+
+def _recv_exact(sock, size):
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError('connection closed')
+        received += n
+    return data
+
+def _recv_message(sock):
+    kind, arg, frame, size = _MESSAGE.unpack(_recv_exact(sock, _MESSAGE.size))
+    return kind, arg, frame, _recv_exact(sock, size) if size else b''
+
+def _send_message(sock, kind, arg, frame, payload=b''):
+    sock.sendall(_MESSAGE.pack(kind, arg, frame, len(payload)))
+    if payload:
+        sock.sendall(payload)
+
+class CommitStreamServer:
+    '''
+    Sends the published records to every connected client, one thread per client.
+    publish() never waits on a client.
+    '''
+    def __init__(self, address, keep_keyframes=2):
+        '''
+        :param address: (host, port) for TCP, port 0 picks a free one, or a Unix socket path
+        :param keep_keyframes: the records since this many keyframes are kept for
+                               reconnecting and slow clients
+        '''
+        self.keep_keyframes = keep_keyframes
+        if _family(address) == socket.AF_UNIX and os.path.exists(address):
+            os.remove(address)
+        self.listener = socket.socket(_family(address), socket.SOCK_STREAM)
+        if _family(address) == socket.AF_INET:
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(address)
+        self.listener.listen()
+        self.address = self.listener.getsockname()
+        # (frame, kind, payload) of the kept records, history[0] has the sequence number base
+        self.history = []
+        self.base = 0
+        self.keyframe_seqs = []
+        self.cond = threading.Condition()
+        self.closed = False
+        self.clients = set()
+        self.thread = threading.Thread(target=self._accept, name='commit-stream-accept', daemon=True)
+        self.thread.start()
+
+    def publish(self, frame, payload, kind=COMMIT):
+        with self.cond:
+            self.history.append((frame, kind, bytes(payload)))
+            if kind == KEYFRAME:
+                self.keyframe_seqs.append(self.base + len(self.history) - 1)
+                if len(self.keyframe_seqs) > self.keep_keyframes:
+                    del self.keyframe_seqs[:-self.keep_keyframes]
+                    # the kept records start with a keyframe
+                    drop = self.keyframe_seqs[0] - self.base
+                    del self.history[:drop]
+                    self.base += drop
+            self.cond.notify_all()
+
+    def publish_json(self, frame, j, kind=COMMIT):
+        self.publish(frame, encode_json(j), kind)
+
+    def _start(self, frame):
+        # the sequence number to send from for a client that needs `frame`
+        end = self.base + len(self.history)
+        if frame != NO_FRAME:
+            for i, (f, kind, _) in enumerate(self.history):
+                if f == frame and kind != KEYFRAME:
+                    return self.base + i
+            commits = [f for f, kind, _ in self.history if kind != KEYFRAME]
+            if commits and frame == commits[-1] + 1:
+                # up to date, wait for the next commit
+                return end
+        if self.keyframe_seqs:
+            return self.keyframe_seqs[-1]
+        return self.base
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(sock,), name='commit-stream-client', daemon=True).start()
+
+    def _serve(self, sock):
+        with self.cond:
+            if self.closed:
+                sock.close()
+                return
+            self.clients.add(sock)
+        try:
+            kind, credits, frame, payload = _recv_message(sock)
+            if kind != HELLO or bytes(payload) != MAGIC:
+                return
+            with self.cond:
+                seq = self._start(frame)
+            while True:
+                while credits == 0:
+                    kind, arg, _, _ = _recv_message(sock)
+                    if kind == CREDIT:
+                        credits += arg
+                with self.cond:
+                    while seq >= self.base + len(self.history) and not self.closed:
+                        self.cond.wait()
+                    if self.closed:
+                        return
+                    # fell behind the kept records, continue from the oldest keyframe
+                    seq = max(seq, self.base)
+                    frame, kind, payload = self.history[seq - self.base]
+                _send_message(sock, RECORD, kind, frame, payload)
+                seq += 1
+                credits -= 1
+                # take the credits that arrived meanwhile without waiting
+                while select.select([sock], [], [], 0)[0]:
+                    kind, arg, _, _ = _recv_message(sock)
+                    if kind == CREDIT:
+                        credits += arg
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self.cond:
+                self.clients.discard(sock)
+            sock.close()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+            clients = list(self.clients)
+        for sock in clients:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        # shutdown wakes the accept() of the thread, close alone does not
+        try:
+            self.listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.listener.close()
+        self.thread.join()
+        if _family(self.address) == socket.AF_UNIX and os.path.exists(self.address):
+            os.remove(self.address)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class CommitStreamClient:
+    '''
+    Receives the records of a CommitStreamServer and reconnects when the connection
+    drops, asking for the frame after the last one received.
+    '''
+    def __init__(self, address, credits=8, retry_interval=0.5, timeout=5.0):
+        '''
+        :param credits: records in flight at most
+        :param retry_interval: seconds between connection attempts
+        :param timeout: seconds a connection attempt, or a record that started to arrive,
+                        may stall before the connection is dropped and made again
+        '''
+        self.address = address
+        self.credits = credits
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        # the last frame received, None before the first keyframe
+        self.frame = None
+        # credits taken but not returned yet, returned in batches
+        self.taken = 0
+        self.reconnects = 0
+        self.sock = None
+
+    def _connect(self, deadline):
+        while self.sock is None:
+            sock = socket.socket(_family(self.address), socket.SOCK_STREAM)
+            timeout = self.timeout
+            if deadline is not None:
+                timeout = min(timeout, max(deadline - time.perf_counter(), 0.001))
+            # without a timeout connect() may wait for the system's TCP timeout, minutes
+            sock.settimeout(timeout)
+            try:
+                sock.connect(self.address)
+                # a record that stalls halfway times out too
+                sock.settimeout(self.timeout)
+                frame = NO_FRAME if self.frame is None else self.frame + 1
+                _send_message(sock, HELLO, self.credits, frame, MAGIC)
+            except OSError:
+                sock.close()
+                if deadline is not None and time.perf_counter() + self.retry_interval > deadline:
+                    return False
+                time.sleep(self.retry_interval)
+                continue
+            self.sock = sock
+            self.taken = 0
+        return True
+
+    def _disconnect(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            self.reconnects += 1
+
+    def recv(self, timeout=None):
+        '''
+        :param timeout: seconds to wait for a record, None waits until one arrives
+        :return: (frame, kind, payload) of the next record, None if none arrived in time
+        '''
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            if not self._connect(deadline):
+                return None
+            try:
+                remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                if not select.select([self.sock], [], [], remaining)[0]:
+                    return None
+                kind, arg, frame, payload = _recv_message(self.sock)
+                if kind != RECORD:
+                    raise ConnectionError(f'unexpected message {kind}')
+                self.taken += 1
+                if self.taken >= max(1, self.credits // 2):
+                    _send_message(self.sock, CREDIT, self.taken, 0)
+                    self.taken = 0
+            except (ConnectionError, OSError):
+                self._disconnect()
+                continue
+            if self.frame is None and arg != KEYFRAME:
+                # nothing to apply a commit to before the first keyframe
+                continue
+            if arg == KEYFRAME and self.frame is not None and frame <= self.frame:
+                # the commits got this client there already
+                continue
+            self.frame = frame
+            return frame, arg, payload
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def loopback(address, frames, size, keyframe_interval, credits, keep_keyframes):
+    '''
+    Stream `frames` commits of `size` bytes through a local server, dropping the connection
+    halfway, and check that the frames arrive in order, each one either the commit after
+    the last frame or a keyframe the client jumped to because it fell behind.
+    '''
+    payload = os.urandom(size)
+    with CommitStreamServer(address, keep_keyframes=keep_keyframes) as server:
+        server.publish_json(0, {'frame': 0}, KEYFRAME)
+        client = CommitStreamClient(server.address, credits=credits, retry_interval=0.05)
+
+        def produce():
+            for f in range(1, frames + 1):
+                server.publish(f, payload)
+                if f % keyframe_interval == 0:
+                    server.publish_json(f, {'frame': f}, KEYFRAME)
+
+        producer = threading.Thread(target=produce)
+        received = [client.recv(timeout=5.0)[:2]]
+        t = time.perf_counter()
+        producer.start()
+        while client.frame != frames:
+            frame, kind, data = client.recv(timeout=5.0)
+            received.append((frame, kind))
+            if frame == frames // 2:
+                # the connection drops, the client continues from frame + 1
+                client.sock.shutdown(socket.SHUT_RDWR)
+        elapsed = time.perf_counter() - t
+        producer.join()
+        client.close()
+    assert received[0][1] == KEYFRAME, 'the first record is not a keyframe'
+    jumps = 0
+    for (last, _), (frame, kind) in zip(received, received[1:]):
+        assert frame == last + 1 or (kind == KEYFRAME and frame > last), f'frame {frame} after {last}'
+        jumps += frame != last + 1
+    print(f'{len(received)} records of {size} bytes in {elapsed:.3f} s, '
+          f'{len(received) * size / elapsed / 2**20:.1f} MiB/s, '
+          f'{client.reconnects} reconnect(s), {jumps} jump(s) to a keyframe')
+
+def main():
+    parser = ap.ArgumentParser(description='Check the commit stream on a loopback connection')
+    parser.add_argument('--unix', type=str, help='Unix socket path instead of TCP on 127.0.0.1')
+    parser.add_argument('--frames', type=int, default=1000, help='Commits to stream')
+    parser.add_argument('--size', type=int, default=64 * 1024, help='Bytes per commit')
+    parser.add_argument('--keyframe-interval', type=int, default=50, help='Frames between keyframes')
+    parser.add_argument('--credits', type=int, default=8, help='Records in flight at most')
+    parser.add_argument('--keep-keyframes', type=int, default=1000, help='Keyframes the server keeps the records since, few make the client jump')
+    args = parser.parse_args()
+    address = args.unix if args.unix else ('127.0.0.1', 0)
+    loopback(address, args.frames, args.size, args.keyframe_interval, args.credits, args.keep_keyframes)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+'''
+Ring buffer of simulation frames in shared memory, for several local consumers at once
+(a viewer, a recorder, a metrics process) without commit files in between.
+
+The producer fixes the layout, the name, dtype and shape of every array, when it creates
+the ring; every frame then fills the next of `slots` slots. Readers attach by name and get
+NumPy views straight into the shared memory, no copy. Layout (little endian, 64 byte aligned):
+
+    header   magic b'UIPCRING', u32 version, u32 layout size, u64 slots, u64 slot size,
+             u64 head: the sequence number of the last complete frame, 0 before the first
+    layout   json [[name, dtype, shape], ...]
+    slots    u64 begin sequence, u64 end sequence, u64 frame, the arrays
+
+Frame n (the n-th write, from 1) goes to slot (n - 1) % slots. The writer sets `begin`
+before it overwrites a slot and `end` after, so a slot holds frame n while both are n. A
+reader that is more than `slots` frames behind the head has lost frames; FrameReader counts
+them in `lagged` and continues from the oldest frame still in the ring. The views of a
+FrameView are overwritten when the writer comes around again: check valid() after using
+them, or copy().
+
+    ring = FrameRingWriter.for_scene('uipc_frames', scene)  # in the simulation
+    ring.write_scene(world.frame())
+
+    reader = FrameReader('uipc_frames')                     # in any other process
+    frame = reader.next(timeout=1.0)
+    frame.arrays['1/vertices/position']
+'''
+import json
+import time
+import struct
+import argparse as ap
+import numpy as np
+from multiprocessing import shared_memory
+
+_MAGIC = b'UIPCRING'
+_VERSION = 1
+_HEADER = struct.Struct('<8sIIQQQ')
+_HEAD_OFFSET = 32
+_SLOT_HEADER = 64
+_ALIGN = 64
+
+def _align(n):
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # before python 3.13 every process that attaches registers the memory with its
+        # resource tracker, which unlinks it when the process exits, readers must not.
+        # The children of multiprocessing share the tracker of their parent, leave it to it
+        import multiprocessing as mp
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name)
+        if mp.parent_process() is None:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+class _Ring:
+    # the views of a ring in the shared memory, shared by writer and readers
+    def __init__(self, shm):
+        self.shm = shm
+        magic, version, layout_size, self.slots, self.slot_size, _ = _HEADER.unpack_from(shm.buf)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f'{shm.name} is not a version {_VERSION} frame ring')
+        self.layout = json.loads(bytes(shm.buf[_HEADER.size:_HEADER.size + layout_size]))
+        self.head = np.ndarray((), dtype='<u8', buffer=shm.buf, offset=_HEAD_OFFSET)
+        data = _align(_HEADER.size + layout_size)
+        self.headers = []
+        self.arrays = []
+        for i in range(self.slots):
+            begin = data + i * self.slot_size
+            self.headers.append(np.ndarray(3, dtype='<u8', buffer=shm.buf, offset=begin))
+            offset = begin + _SLOT_HEADER
+            arrays = {}
+            for name, dtype, shape in self.layout:
+                a = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+                arrays[name] = a
+                offset += _align(a.nbytes)
+            self.arrays.append(arrays)
+
+    @staticmethod
+    def slot_size(layout):
+        return _SLOT_HEADER + sum(_align(int(np.prod(shape)) * np.dtype(dtype).itemsize) for _, dtype, shape in layout)
+
+    def slot(self, seq):
+        return (seq - 1) % self.slots
+
+    def release(self):
+        self.head = self.headers = self.arrays = None
+        self.shm.close()
+
+class FrameView:
+    '''
+    A frame of the ring, the arrays are views of the shared memory.
+    '''
+    def __init__(self, ring, seq):
+        self.ring = ring
+        self.seq = seq
+        i = ring.slot(seq)
+        self.frame = int(ring.headers[i][2])
+        self.arrays = ring.arrays[i]
+
+    def valid(self):
+        '''
+        :return: False once the writer started to overwrite this frame
+        '''
+        return int(self.ring.headers[self.ring.slot(self.seq)][0]) == self.seq
+
+    def copy(self):
+        '''
+        :return: {name: copy of the array}, None if the frame was overwritten meanwhile
+        '''
+        arrays = {name: a.copy() for name, a in self.arrays.items()}
+        return arrays if self.valid() else None
+
+class FrameRingWriter:
+    '''
+    Creates the ring and writes the frames, one writer per ring.
+    '''
+    def __init__(self, name, layout, slots=8):
+        '''
+        :param layout: [(name, dtype, shape)] of the arrays of every frame
+        :param slots: frames kept, how far a reader may fall behind
+        '''
+        layout = [[name, np.dtype(dtype).str, list(shape)] for name, dtype, shape in layout]
+        encoded = json.dumps(layout).encode()
+        slot_size = _Ring.slot_size(layout)
+        size = _align(_HEADER.size + len(encoded)) + slots * slot_size
+        shm = shared_memory.SharedMemory(name, create=True, size=size)
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, _VERSION, len(encoded), slots, slot_size, 0)
+        shm.buf[_HEADER.size:_HEADER.size + len(encoded)] = encoded
+        self.ring = _Ring(shm)
+        self.name = shm.name
+        self.seq = 0
+        self.visitor = None
+
+    @classmethod
+    def for_scene(cls, name, scene, slots=8):
+        '''
+        A ring of the vertex positions and instance transforms of every geometry of a scene,
+        named "geometry id/collection/attribute" like the entries of incremental_snapshot.py.
+        '''
+        from uipc.backend import SceneVisitor
+        from incremental_snapshot import tracked_arrays
+        visitor = SceneVisitor(scene)
+        layout = [(f'{gid}/{attr}', a.dtype, a.shape) for (gid, attr), a in tracked_arrays(visitor)]
+        writer = cls(name, layout, slots)
+        writer.visitor = visitor
+        return writer
+
+    def write(self, frame, arrays):
+        '''
+        :param arrays: {name: array} of every array of the layout
+        :return: the sequence number of the frame
+        '''
+        seq = self.seq + 1
+        i = self.ring.slot(seq)
+        header = self.ring.headers[i]
+        # readers of the frame in this slot see it go invalid first
+        header[0] = seq
+        for name, a in self.ring.arrays[i].items():
+            a[...] = arrays[name]
+        header[2] = frame
+        header[1] = seq
+        self.ring.head[...] = seq
+        self.seq = seq
+        return seq
+
+    def write_scene(self, frame):
+        '''
+        Write the tracked arrays of the scene of for_scene(). The geometries must not change,
+        create a new ring if they do.
+        '''
+        from incremental_snapshot import tracked_arrays
+        self.write(frame, {f'{gid}/{attr}': a for (gid, attr), a in tracked_arrays(self.visitor)})
+
+    def close(self):
+        '''
+        Remove the ring, attached readers keep their mapping until they close.
+        '''
+        shm = self.ring.shm
+        self.ring.release()
+        shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class FrameReader:
+    '''
+    Attaches to a ring and reads its frames in order, from the newest one at the time of attaching.
+    '''
+    def __init__(self, name, poll_interval=0.001):
+        self.ring = _Ring(_attach(name))
+        self.poll_interval = poll_interval
+        # the sequence number of the next frame to read
+        self.next_seq = max(1, int(self.ring.head))
+        # frames lost because the writer overwrote them before they were read
+        self.lagged = 0
+
+    @property
+    def layout(self):
+        return self.ring.layout
+
+    def lag(self):
+        '''
+        :return: frames written but not read yet
+        '''
+        return int(self.ring.head) - self.next_seq + 1
+
+    def next(self, timeout=None):
+        '''
+        :param timeout: seconds to wait for the next frame, None waits for ever
+        :return: FrameView of the next frame, None if there was none in time
+        '''
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            head = int(self.ring.head)
+            oldest = head - self.ring.slots + 1
+            if self.next_seq < oldest:
+                self.lagged += oldest - self.next_seq
+                self.next_seq = oldest
+            if self.next_seq <= head:
+                view = FrameView(self.ring, self.next_seq)
+                if not view.valid():
+                    # overwritten between reading the head and the slot, behind again
+                    continue
+                self.next_seq += 1
+                return view
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def latest(self):
+        '''
+        :return: FrameView of the newest frame, skipping the ones in between, None before the first
+        '''
+        head = int(self.ring.head)
+        if head == 0:
+            return None
+        self.next_seq = head
+        return self.next()
+
+    def close(self):
+        self.ring.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def _consume(name, frames, delay, result):
+    # a reader process of the demo
+    with FrameReader(name) as reader:
+        read = 0
+        first = None
+        checked = True
+        while True:
+            view = reader.next(timeout=2.0)
+            if view is None:
+                break
+            first = view.frame if first is None else first
+            arrays = view.copy()
+            if arrays is not None:
+                # every value of a frame is the frame number, a torn frame would mix two
+                checked &= all(bool((a == view.frame).all()) for a in arrays.values())
+            read += 1
+            if view.frame == frames:
+                break
+            time.sleep(delay)
+        result.put((delay, first, read, reader.lagged, checked))
+
+def demo(name, frames, geometries, vertices, slots, delays):
+    '''
+    One writer, a reader process per delay, the slow ones fall behind and lose frames.
+    '''
+    import multiprocessing as mp
+    layout = [(f'{g}/vertices/position', 'f8', (vertices, 3, 1)) for g in range(geometries)]
+    layout += [(f'{g}/instances/transform', 'f8', (1, 4, 4)) for g in range(geometries)]
+    with FrameRingWriter(name, layout, slots) as writer:
+        result = mp.Queue()
+        readers = [mp.Process(target=_consume, args=(writer.name, frames, d, result)) for d in delays]
+        for p in readers:
+            p.start()
+        # let the readers attach before the first frame
+        time.sleep(1.0)
+        arrays = {n: np.zeros(shape) for n, _, shape in layout}
+        t = time.perf_counter()
+        for f in range(1, frames + 1):
+            for a in arrays.values():
+                a[...] = f
+            writer.write(f, arrays)
+            time.sleep(0.002)
+        elapsed = time.perf_counter() - t
+        results = sorted(result.get() for _ in readers)
+        for p in readers:
+            p.join()
+    size = sum(int(np.prod(shape)) * 8 for _, _, shape in layout) / 2**20
+    print(f'{frames} frames of {size:.1f} MiB, {elapsed / frames * 1000:.2f} ms per frame written (2 ms of it sleep)')
+    print(f'{"delay [ms]":>12}{"read":>8}{"lagged":>8}{"consistent":>12}')
+    for delay, first, read, lagged, checked in results:
+        print(f'{delay * 1000:>12.1f}{read:>8}{lagged:>8}{str(checked):>12}')
+
+def main():
+    parser = ap.ArgumentParser(description='Frame ring demo: one writer, reader processes of different speeds')
+    parser.add_argument('--name', type=str, default='uipc_frames_demo', help='Shared memory name')
+    parser.add_argument('--frames', type=int, default=500, help='Frames to write')
+    parser.add_argument('--geometries', type=int, default=10, help='Geometries per frame')
+    parser.add_argument('--vertices', type=int, default=1000, help='Vertices per geometry')
+    parser.add_argument('--slots', type=int, default=8, help='Frames in the ring')
+    parser.add_argument('--delays', type=float, nargs='+', default=[0.0, 0.001, 0.005], help='Seconds every reader spends per frame')
+    args = parser.parse_args()
+    demo(args.name, args.frames, args.geometries, args.vertices, args.slots, args.delays)
+
+if __name__ == '__main__':
+    main()
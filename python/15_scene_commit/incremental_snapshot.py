@@ -0,0 +1,174 @@
+'''
+Incremental alternative to SceneSnapshot for scenes whose topology does not change.
+
+SceneSnapshot(scene) copies the whole scene after every frame so that the next commit
+can diff against it. IncrementalSnapshot only looks at the attributes a simulation moves
+(vertex positions and instance transforms by default) and copies the ones that changed,
+found by comparing with their last committed values ("compare", a read instead of a
+copy of everything) or by content hash ("hash", slower but keeps no copy of the data).
+The commit is a binary ATTRIBUTES record:
+
+    u32 header size, json header {"entries": [[geometry id, attribute, dtype, shape], ...]},
+    the raw arrays one after another
+
+This is lossy: only the tracked attributes are committed. The attributes animators
+usually change, WATCHED (is_fixed, aim_position, ...), are hashed as well: if one of them
+changes, or geometries are added or removed, commit() returns None and a keyframe must be
+written instead. Changes to any other attribute, e.g. velocities, the topology or the
+material parameters, are not seen at all; track or watch them, or use SceneSnapshot.
+'''
+import json
+import struct
+import hashlib
+import numpy as np
+
+# (collection, attribute) tracked by default, what changes between frames
+TRACKED = (('vertices', 'position'), ('instances', 'transform'))
+# (collection, attribute) that need a keyframe when they change, by default what the
+# animators of the samples set besides positions and transforms. Not the velocities:
+# retrieve() may write them every frame, that would make every frame a keyframe
+WATCHED = (('vertices', 'is_fixed'), ('vertices', 'is_constrained'), ('vertices', 'aim_position'),
+           ('instances', 'is_fixed'), ('instances', 'is_constrained'), ('instances', 'is_dynamic'),
+           ('instances', 'aim_transform'))
+
+_SIZE = struct.Struct('<I')
+
+def encode_attributes(entries):
+    '''
+    :param entries: [(geometry id, attribute name, numpy array)]
+    '''
+    header = json.dumps({'entries': [[gid, name, a.dtype.str, list(a.shape)] for gid, name, a in entries]}).encode()
+    return b''.join([_SIZE.pack(len(header)), header] + [np.ascontiguousarray(a).tobytes() for _, _, a in entries])
+
+def decode_attributes(payload):
+    '''
+    :return: [(geometry id, attribute name, numpy array)], the arrays are views of the payload
+    '''
+    size = _SIZE.unpack_from(payload)[0]
+    header = json.loads(bytes(payload[_SIZE.size:_SIZE.size + size]))
+    offset = _SIZE.size + size
+    entries = []
+    for gid, name, dtype, shape in header['entries']:
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        a = np.frombuffer(payload, dtype=dtype, count=count, offset=offset).reshape(shape)
+        entries.append((gid, name, a))
+        offset += count * dtype.itemsize
+    return entries
+
+def _digest(a):
+    # sha1 runs in hardware on most cpus, about twice as fast as blake2b here
+    return hashlib.sha1(np.ascontiguousarray(a).view(np.uint8)).digest()
+
+class DirtyTracker:
+    '''
+    Finds the named arrays that changed since the last update().
+
+    :param mode: "compare" keeps the last values and compares against them,
+                 "hash" keeps a content hash only
+    '''
+    def __init__(self, mode='compare'):
+        if mode not in ('compare', 'hash'):
+            raise ValueError(f'unknown mode {mode}')
+        self.mode = mode
+        # key -> last values or their hash
+        self.state = {}
+
+    def _changed(self, key, a):
+        last = self.state.get(key)
+        if self.mode == 'hash':
+            h = _digest(a)
+            if last == h:
+                return None
+            self.state[key] = h
+            return np.array(a)
+        if last is not None and last.shape == a.shape and last.dtype == a.dtype and np.array_equal(last, a):
+            return None
+        # a new array every time, the returned copies stay valid after later updates
+        self.state[key] = np.array(a)
+        return self.state[key]
+
+    def update(self, arrays):
+        '''
+        :param arrays: iterable of (key, numpy array)
+        :return: [(key, copy of the array)] for the arrays that are new or changed
+        '''
+        changed = []
+        for key, a in arrays:
+            copy = self._changed(key, a)
+            if copy is not None:
+                changed.append((key, copy))
+        return changed
+
+def _attribute(geo, collection, name):
+    c = getattr(geo, collection, None)
+    if c is None:
+        return None
+    return c().find(name)
+
+def tracked_arrays(visitor, tracked=TRACKED):
+    '''
+    :param visitor: uipc.backend.SceneVisitor of the scene
+    :return: ((geometry id, "collection/attribute"), view of the attribute) of every tracked
+             attribute of every geometry
+    '''
+    from uipc import view
+    for slot in visitor.geometries():
+        geo = slot.geometry()
+        for collection, name in tracked:
+            attr = _attribute(geo, collection, name)
+            if attr is not None:
+                yield (slot.id(), f'{collection}/{name}'), view(attr)
+
+class IncrementalSnapshot:
+    '''
+    Tracks the attributes of every geometry of a scene, see DirtyTracker for the modes.
+    The watched attributes are not committed, a change of them asks for a keyframe.
+
+        snapshot = IncrementalSnapshot(scene)   # the state the client loaded
+        ...advance, retrieve...
+        payload = snapshot.commit()             # only what changed since the last commit
+    '''
+    def __init__(self, scene, tracked=TRACKED, mode='compare', watched=WATCHED):
+        from uipc.backend import SceneVisitor
+        self.visitor = SceneVisitor(scene)
+        self.tracked = tracked
+        self.tracker = DirtyTracker(mode)
+        self.watched = tuple(w for w in watched if w not in tracked)
+        self.watcher = DirtyTracker('hash')
+        self.geometry_ids = None
+        # record the current state, the first commit is what changed after it
+        self.commit()
+
+    def commit(self):
+        '''
+        :return: the ATTRIBUTES payload of the attributes that changed since the last commit,
+                 None if the set of geometries or a watched attribute changed and a full
+                 keyframe is needed
+        '''
+        ids = sorted(slot.id() for slot in self.visitor.geometries())
+        first = self.geometry_ids is None
+        structural = not first and ids != self.geometry_ids
+        self.geometry_ids = ids
+        changed = self.tracker.update(tracked_arrays(self.visitor, self.tracked))
+        watched = self.watcher.update(tracked_arrays(self.visitor, self.watched))
+        if structural or (watched and not first):
+            return None
+        return encode_attributes([(gid, name, a) for (gid, name), a in changed])
+
+def apply_attributes(scene, payload):
+    '''
+    Apply an ATTRIBUTES payload to a scene, e.g. on the client.
+    '''
+    apply_entries(scene, decode_attributes(payload))
+
+def apply_entries(scene, entries):
+    '''
+    Apply the entries of a decoded ATTRIBUTES payload to a scene.
+    '''
+    from uipc import view
+    from uipc.backend import SceneVisitor
+    slots = {slot.id(): slot for slot in SceneVisitor(scene).geometries()}
+    for gid, name, a in entries:
+        collection, attr_name = name.split('/', 1)
+        view(_attribute(slots[gid].geometry(), collection, attr_name))[:] = a
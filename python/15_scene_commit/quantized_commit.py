@@ -0,0 +1,210 @@
+'''
+Error-bounded quantized encoding of ATTRIBUTES commits, for streaming to a viewer.
+
+The float64 positions and transforms of incremental_snapshot.py are quantized to integers
+of a fixed step, such that no coordinate is off by more than `error`. Every array is coded
+as its delta from what the decoder already has (closed loop: the encoder keeps the
+decoder's values, so the error does not accumulate), the integers are stored in the
+narrowest integer type, byte-shuffled and compressed with zlib or lzma. The commit is a
+QUANTIZED record:
+
+    u8 codec (0 zlib, 1 lzma), u32 header size, then compressed: the json header
+    {"entries": [[geometry id, attribute, shape, mode, integer dtype, steps], ...]} and
+    the integers of all the entries
+
+mode "absolute" is the array itself, "delta" its change from the decoder's current values,
+the values of the scene it is applied to. After a keyframe the encoder must be reset():
+the client may have loaded the exact values of the keyframe, so every array is sent
+absolute once again before deltas continue.
+
+Steps: positions are quantized with step 2 error. A transform moves the points p of its
+geometry to R p + t, so the translation gets step error and the 3x3 part step
+error / (3 extent), where extent is the largest coordinate of the geometry's positions;
+the transformed points then stay within error too.
+'''
+import json
+import lzma
+import zlib
+import struct
+import numpy as np
+
+from incremental_snapshot import tracked_arrays, _attribute
+
+_PREFIX = struct.Struct('<BI')
+_CODECS = {
+    'zlib': (0, lambda b: zlib.compress(b, 6), zlib.decompress),
+    'lzma': (1, lambda b: lzma.compress(b, preset=6), lzma.decompress),
+}
+_CODEC_IDS = {c[0]: name for name, c in _CODECS.items()}
+_INTS = [np.dtype('<i1'), np.dtype('<i2'), np.dtype('<i4'), np.dtype('<i8')]
+
+def _narrowest(q):
+    m = int(np.abs(q).max()) if q.size else 0
+    for dtype in _INTS:
+        if m <= np.iinfo(dtype).max:
+            return dtype
+    raise OverflowError('quantized values do not fit into 64 bits')
+
+def _shuffle(q):
+    # the bytes of equal significance next to each other, the high ones are mostly 0 or 0xff
+    return np.ascontiguousarray(q).view(np.uint8).reshape(-1, q.dtype.itemsize).T.tobytes()
+
+def _unshuffle(data, dtype, count):
+    return np.frombuffer(data, dtype=np.uint8, count=count * dtype.itemsize).reshape(dtype.itemsize, count).T.copy().view(dtype).ravel()
+
+def _steps(name, shape, error, extent):
+    # [step] of positions, [step of the 3x3 part, step of the translation] of transforms
+    if name.endswith('transform') and tuple(shape[-2:]) == (4, 4):
+        return [error / (3 * max(extent, 1e-12)), error]
+    return [2 * error]
+
+def _step_array(steps):
+    if len(steps) == 2:
+        a = np.full((4, 4), steps[0])
+        a[:3, 3] = steps[1]
+        return a
+    return np.float64(steps[0])
+
+class QuantizedEncoder:
+    '''
+    Encodes the entries of ATTRIBUTES commits within an absolute error.
+
+        encoder = QuantizedEncoder.for_scene(scene, tolerance=1e-4)
+        payload = encoder.encode(decode_attributes(snapshot.commit()))
+        ...
+        encoder.reset()     # after every keyframe
+    '''
+    def __init__(self, error, extents=None, codec='zlib'):
+        '''
+        :param error: the largest error of a coordinate
+        :param extents: {geometry id: largest coordinate of its positions}, bounds the
+                        error of the transformed points, 1 for a geometry without one
+        :param codec: "zlib" or "lzma"
+        '''
+        if codec not in _CODECS:
+            raise ValueError(f'unknown codec {codec}')
+        self.error = error
+        self.extents = extents or {}
+        self.codec = codec
+        # (geometry id, attribute) -> the values the decoder has
+        self.state = {}
+        # (geometry id, attribute) -> (steps, step array)
+        self.steps = {}
+
+    @classmethod
+    def for_scene(cls, scene, tolerance=1e-4, codec='zlib'):
+        '''
+        :param tolerance: the error, relative to the diagonal of the scene's bounding box
+        '''
+        from uipc.backend import SceneVisitor
+        lo, hi, extents = scene_bounds(tracked_arrays(SceneVisitor(scene)))
+        return cls(tolerance * float(np.linalg.norm(hi - lo)), extents, codec)
+
+    def reset(self):
+        self.state.clear()
+
+    def encode(self, entries):
+        '''
+        :param entries: [(geometry id, attribute name, numpy array)] of decode_attributes
+        :return: the QUANTIZED payload
+        '''
+        header = []
+        blobs = []
+        for gid, name, a in entries:
+            a = np.asarray(a, dtype=np.float64)
+            if (gid, name) not in self.steps:
+                steps = _steps(name, a.shape, self.error, self.extents.get(gid, 1.0))
+                self.steps[(gid, name)] = steps, _step_array(steps)
+            steps, step = self.steps[(gid, name)]
+            last = self.state.get((gid, name))
+            if last is not None and last.shape == a.shape:
+                mode = 'delta'
+                q = np.rint((a - last) / step).astype(np.int64)
+                decoded = last + q * step
+            else:
+                mode = 'absolute'
+                q = np.rint(a / step).astype(np.int64)
+                decoded = q * step
+            # what the decoder will compute, the next delta starts from it
+            self.state[(gid, name)] = decoded
+            dtype = _narrowest(q)
+            header.append([gid, name, list(a.shape), mode, dtype.str, steps])
+            blobs.append(_shuffle(q.astype(dtype)))
+        codec, compress, _ = _CODECS[self.codec]
+        # the header goes through the compressor too, its names and steps repeat
+        encoded = json.dumps({'entries': header}, separators=(',', ':')).encode()
+        return _PREFIX.pack(codec, len(encoded)) + compress(b''.join([encoded] + blobs))
+
+def decode_quantized(payload):
+    '''
+    :return: [(geometry id, attribute name, mode, float64 array)], mode "absolute" for the
+             values, "delta" for the change to add to the current values
+    '''
+    codec, size = _PREFIX.unpack_from(payload)
+    _, _, decompress = _CODECS[_CODEC_IDS[codec]]
+    data = decompress(bytes(payload[_PREFIX.size:]))
+    header = json.loads(data[:size])
+    offset = size
+    entries = []
+    for gid, name, shape, mode, dtype, steps in header['entries']:
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        q = _unshuffle(data[offset:offset + count * dtype.itemsize], dtype, count).reshape(shape)
+        offset += count * dtype.itemsize
+        entries.append((gid, name, mode, q * _step_array(steps)))
+    return entries
+
+def dequantize(entries, current):
+    '''
+    :param entries: of decode_quantized
+    :param current: callable (geometry id, attribute name) -> the current values
+    :return: [(geometry id, attribute name, array)] as decode_attributes, for apply_entries
+    '''
+    return [(gid, name, a if mode == 'absolute' else current(gid, name) + a) for gid, name, mode, a in entries]
+
+def apply_quantized(scene, payload):
+    '''
+    Apply a QUANTIZED payload to a scene, the deltas go on top of its current values.
+    '''
+    apply_quantized_entries(scene, decode_quantized(payload))
+
+def apply_quantized_entries(scene, entries):
+    '''
+    Apply the entries of decode_quantized to a scene.
+    '''
+    from uipc import view
+    from uipc.backend import SceneVisitor
+    slots = {slot.id(): slot for slot in SceneVisitor(scene).geometries()}
+    for gid, name, mode, a in entries:
+        collection, attr_name = name.split('/', 1)
+        values = view(_attribute(slots[gid].geometry(), collection, attr_name))
+        if mode == 'absolute':
+            values[:] = a
+        else:
+            values[:] = values + a
+
+def scene_bounds(tracked):
+    '''
+    :param tracked: ((geometry id, attribute name), array) of tracked_arrays
+    :return: (lo, hi, extents), the bounding box of the scene in world space and the
+             largest coordinate of the positions of every geometry
+    '''
+    arrays = {}
+    for (gid, name), a in tracked:
+        arrays.setdefault(gid, {})[name] = a
+    lo = np.full(3, np.inf)
+    hi = np.full(3, -np.inf)
+    extents = {}
+    for gid, geo in arrays.items():
+        p = geo.get('vertices/position')
+        if p is None or len(p) == 0:
+            continue
+        p = np.asarray(p).reshape(-1, 3)
+        extents[gid] = float(np.abs(p).max())
+        for t in np.asarray(geo.get('instances/transform', np.eye(4)[None])).reshape(-1, 4, 4):
+            w = p @ t[:3, :3].T + t[:3, 3]
+            lo = np.minimum(lo, w.min(axis=0))
+            hi = np.maximum(hi, w.max(axis=0))
+    if not extents:
+        return np.zeros(3), np.ones(3), extents
+    return lo, hi, extents
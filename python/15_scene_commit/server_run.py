@@ -12,6 +12,11 @@ from uipc.constitution import AffineBodyConstitution, StableNeoHookean
 from uipc.gui import SceneGUI
 from uipc.unit import MPa, GPa
 from asset_dir import AssetDir
+from commit_log import AsyncCommitLogWriter, KEYFRAME, ATTRIBUTES, QUANTIZED
+from incremental_snapshot import IncrementalSnapshot, decode_attributes
+from quantized_commit import QuantizedEncoder
+from commit_stream import CommitStreamServer
+from frame_ring import FrameRingWriter
 
 Logger.set_level(Logger.Level.Warn)
 
@@ -86,25 +91,98 @@ j = scene_io.to_json()
 # --------------------------------------------------
 
 world.init(scene)
-# record the snapshot of current scene
-# to create scene commit
-ss = SceneSnapshot(scene)
+# incremental: only compare the positions and transforms after every frame and commit
+# the ones that changed, instead of copying the whole scene into a SceneSnapshot.
+# It is lossy: a change of the watched attributes (is_fixed, aim_position, ...) writes
+# a keyframe, changes of any other attribute are not committed at all. Turn it on for
+# scenes where only positions and transforms change
+incremental = False
+if(incremental):
+    snapshot = IncrementalSnapshot(scene)
+else:
+    # record the snapshot of current scene
+    # to create scene commit
+    ss = SceneSnapshot(scene)
+
+# all the commits go to one append-only log, indexed by frame,
+# written on a background thread so advance() does not wait on the disk
+log_path = f'{output_path}/scene/commits.log'
+commit_log = AsyncCommitLogWriter(log_path, depth=8, reset=True)
+# a full scene every keyframe_interval frames, a client seeks to any frame
+# by loading the keyframe before it and applying at most keyframe_interval commits
+keyframe_interval = 50
+commit_log.append_json(0, scene_io.to_json(), KEYFRAME)
+# also stream the commits to viewers on other machines, e.g. ('0.0.0.0', 9090)
+# or a Unix socket path, see commit_stream.py and stream_address in client_get.py
+stream_address = None
+stream = None
+# quantize the streamed positions and transforms within this error, relative to the
+# diagonal of the scene's bounding box, e.g. 1e-4, see quantized_commit.py; the log keeps the exact values.
+# Needs incremental = True
+quantize = None
+encoder = None
+if(stream_address is not None):
+    stream = CommitStreamServer(stream_address)
+    stream.publish_json(0, scene_io.to_json(), KEYFRAME)
+    if(quantize is not None and incremental):
+        encoder = QuantizedEncoder.for_scene(scene, quantize)
+# also fan the positions and transforms of every frame out to local processes
+# (viewer, recorder, metrics) through shared memory, e.g. 'uipc_frames', see frame_ring.py
+ring_name = None
+ring = None
+if(ring_name is not None):
+    ring = FrameRingWriter.for_scene(ring_name, scene)
 
 while world.frame() < 1000:
     world.advance()
     world.retrieve()
-    path = f'{output_path}/scene/scene{world.frame()}.bson'
+    if(ring is not None):
+        ring.write_scene(world.frame())
     
+    keyframe = world.frame() % keyframe_interval == 0
     # -------------------------------------------------------
-    # commit the scene update to a file
-    scene_io.commit(ss, path)
-    # OR use:
-    j = scene_io.commit_to_json(ss)
-    # and pass on the json to anywhere you want
+    # commit the scene update to the log
+    if(incremental):
+        payload = snapshot.commit()
+        if(payload is None):
+            # geometries were added or removed, only a keyframe describes that
+            keyframe = True
+        else:
+            commit_log.append(world.frame(), payload, ATTRIBUTES)
+            if(encoder is not None):
+                stream.publish(world.frame(), encoder.encode(decode_attributes(payload)), QUANTIZED)
+            elif(stream is not None):
+                stream.publish(world.frame(), payload, ATTRIBUTES)
+    else:
+        # the diff and the new snapshot read the scene, they run here before the next
+        # advance(); only encoding and writing the commit happen on the writer's thread
+        j = scene_io.commit_to_json(ss)
+        commit_log.append_json(world.frame(), j)
+        if(stream is not None):
+            stream.publish_json(world.frame(), j)
+        # OR use:
+        # scene_io.commit(ss, f'{output_path}/scene/scene{world.frame()}.bson')
+        # to write one file per frame
+        
+        # update the scene snapshot
+        ss = SceneSnapshot(scene) 
+    if(keyframe):
+        j = scene_io.to_json()
+        commit_log.append_json(world.frame(), j, KEYFRAME)
+        if(stream is not None):
+            stream.publish_json(world.frame(), j, KEYFRAME)
+        if(encoder is not None):
+            # a client may load this keyframe, the next commits must not be deltas from before it
+            encoder.reset()
     # -------------------------------------------------------
     
-    # update the scene snapshot
-    ss = SceneSnapshot(scene) 
-    print(f'frame {world.frame()} saved to {path}')
+    print(f'frame {world.frame()} saved to {log_path}')
+
+commit_log.close()
+if(stream is not None):
+    stream.close()
+if(ring is not None):
+    ring.close()
+print(f'waited {commit_log.wait_time:.3f} s on the commit log writer')
 
 print('finished!')
\ No newline at end of file
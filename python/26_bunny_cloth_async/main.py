@@ -14,6 +14,7 @@ from uipc import ResidentThread
 import time
 
 from asset_dir import AssetDir
+from samples_common import read_mesh
 
 Timer.enable_all()
 Logger.set_level(Logger.Level.Warn)
@@ -51,11 +52,7 @@ cloth.geometries().create(cloth_mesh)
 bunny = scene.objects().create('bunny')
 t = Transform.Identity()
 t.translate(Vector3.UnitX() + Vector3.UnitZ())
-io = SimplicialComplexIO(t)
-bunny_mesh = io.read(f'{tetmesh_path}/bunny0.msh')
-label_surface(bunny_mesh)
-label_triangle_orient(bunny_mesh)
-bunny_mesh = flip_inward_triangles(bunny_mesh)
+bunny_mesh = read_mesh(f'{tetmesh_path}/bunny0.msh', t)
 abd = AffineBodyConstitution()
 abd.apply_to(bunny_mesh, 100 * MPa)
 is_fixed = bunny_mesh.instances().find(builtin.is_fixed)
@@ -0,0 +1,99 @@
+import json
+import numpy as np
+
+import uipc
+from uipc import view
+from uipc import Vector3, Transform, Quaternion, AngleAxis
+from uipc.core import Scene
+from uipc.geometry import SimplicialComplex, ground
+from uipc.constitution import AffineBodyConstitution
+from uipc.unit import MPa, GPa
+
+from asset_dir import AssetDir
+from samples_common import read_mesh
+
+def build_mesh(json, obj: uipc.core.Object, mesh:SimplicialComplex):
+    t = Transform.Identity()
+    position = Vector3.Zero()
+    if 'position' in json:
+        position[0] = json['position'][0]
+        position[1] = json['position'][1]
+        position[2] = json['position'][2]
+        t.translate(position)
+    
+    Q = Quaternion.Identity()
+    if 'rotation' in json:
+        rotation = Vector3.Zero()
+        rotation[0] = json['rotation'][0]
+        rotation[1] = json['rotation'][1]
+        rotation[2] = json['rotation'][2]
+        rotation *= np.pi / 180
+        Q = AngleAxis(rotation[2][0], Vector3.UnitZ())  * AngleAxis(rotation[1][0], Vector3.UnitY()) * AngleAxis(rotation[0][0], Vector3.UnitX())
+        t.rotate(Q)
+        
+    is_fixed = 0
+    if 'is_dof_fixed' in json:
+        is_fixed = json['is_dof_fixed']
+    
+    this_mesh = mesh.copy()
+    view(this_mesh.transforms())[0] = t.matrix()
+    
+    is_fixed_attr = this_mesh.instances().find('is_fixed')
+    view(is_fixed_attr)[0] = is_fixed
+    
+    obj.geometries().create(this_mesh)
+
+def build_scene():
+    # no GUI here, the scene is shared by main.py and `python -m samples run`
+    folder = AssetDir.folder(__file__)
+
+    config = Scene.default_config()
+    config['dt'] = 0.033
+    config['contact']['d_hat']              = 0.01
+    config['line_search']['max_iter']       = 8
+    config['newton']['velocity_tol']       = 0.2
+    config['cfl']['enable'] = False
+    print(config)
+
+    scene = Scene(config)
+    abd = AffineBodyConstitution()
+    scene.contact_tabular().default_model(0.02, 10 * GPa)
+    default_contact = scene.contact_tabular().default_element()
+
+    with open(f'{folder}/wrecking_ball.json') as f:
+        wrecking_ball_scene = json.load(f)
+
+    tetmesh_dir = AssetDir.tetmesh_path()
+
+    # read + label_surface + label_triangle_orient + flip_inward_triangles, cached on disk
+    cube = read_mesh(f'{tetmesh_dir}/cube.msh')
+    ball = read_mesh(f'{tetmesh_dir}/ball.msh')
+    link = read_mesh(f'{tetmesh_dir}/link.msh')
+
+    cube_obj = scene.objects().create('cubes')
+    ball_obj = scene.objects().create('balls')
+    link_obj = scene.objects().create('links')
+
+    abd.apply_to(cube, 10 * MPa)
+    default_contact.apply_to(cube)
+
+    abd.apply_to(ball, 10 * MPa)
+    default_contact.apply_to(ball)
+
+    abd.apply_to(link, 10 * MPa)
+    default_contact.apply_to(link)
+
+    for obj in wrecking_ball_scene:
+        if obj['mesh'] == 'link.msh':
+            build_mesh(obj, link_obj, link)
+        elif obj['mesh'] == 'ball.msh':
+            build_mesh(obj, ball_obj, ball)
+        elif obj['mesh'] == 'cube.msh':
+            build_mesh(obj, cube_obj, cube)
+
+    ground_height = -1.0
+    g = ground(ground_height)
+    ground_obj = scene.objects().create('ground')
+    ground_obj.geometries().create(g)
+
+    return scene
@@ -12,8 +12,10 @@ from uipc.constitution import AffineBodyConstitution, RotatingMotor
 from uipc.gui import SceneGUI
 
 from asset_dir import AssetDir
+from samples_common import TimerCollector
 
 Timer.enable_all()
+timer_trace = TimerCollector()
 Logger.set_level(Logger.Level.Warn)
 
 workspace = AssetDir.output_path(__file__)
@@ -114,9 +116,12 @@ def on_update():
             world.advance()
             world.retrieve()
             world.dump()
-            Timer.report()
+            timer_trace.capture(world.frame())
 
         sgui.update()
 
 ps.set_user_callback(on_update)
-ps.show()
\ No newline at end of file
+ps.show()
+
+# Chrome trace, per-frame columns and p50/p95/max of every timer
+timer_trace.save(workspace)
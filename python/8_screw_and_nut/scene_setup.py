@@ -0,0 +1,55 @@
+import numpy as np
+
+from uipc import view
+from uipc import Animation
+from uipc import Vector3
+from uipc import builtin
+from uipc.core import Scene
+from uipc.geometry import SimplicialComplexSlot
+from uipc.constitution import AffineBodyConstitution, RotatingMotor
+from uipc.unit import MPa
+
+from asset_dir import AssetDir
+from samples_common import SURFACE, read_mesh
+
+def screw_animation(info:Animation.UpdateInfo):
+    geo_slots = info.geo_slots()
+    geo_slot: SimplicialComplexSlot = geo_slots[0]
+    geo = geo_slot.geometry()
+    is_constrained = geo.instances().find(builtin.is_constrained)
+    view(is_constrained)[0] = 1
+    RotatingMotor.animate(geo, info.dt())
+
+def build_scene():
+    # no GUI here, the scene is shared by main.py and `python -m samples run`
+    config = Scene.default_config()
+    config['dt'] = 0.005
+    config['contact']['d_hat'] = 0.02
+    config['contact']['friction']['enable'] = False
+    config['newton']['velocity_tol']       = 0.05
+    config['gravity'] = [[0.0], [-0.0], [0.0]]
+    print(config)
+    scene = Scene(config)
+
+    # begin setup the scene
+    abd = AffineBodyConstitution()
+    rm = RotatingMotor()
+    scene.contact_tabular().default_model(0, 1e9)
+
+    screw_obj = scene.objects().create('screw')
+    screw_mesh = read_mesh(f'{AssetDir.trimesh_path()}/screw-and-nut/screw-big-2.obj', steps=SURFACE)
+    abd.apply_to(screw_mesh, 100 * MPa)
+    rm.apply_to(screw_mesh, 100, motor_axis=Vector3.UnitY(), motor_rot_vel=-np.pi)
+    screw_obj.geometries().create(screw_mesh)
+
+    scene.animator().insert(screw_obj, screw_animation)
+
+    nut_obj = scene.objects().create('nut')
+    nut_mesh = read_mesh(f'{AssetDir.trimesh_path()}/screw-and-nut/nut-big-2.obj', steps=SURFACE)
+    abd.apply_to(nut_mesh, 100 * MPa)
+    is_fixed = nut_mesh.instances().find(builtin.is_fixed)
+    view(is_fixed)[:] = 1
+    nut_obj.geometries().create(nut_mesh)
+    # end setup the scene
+
+    return scene
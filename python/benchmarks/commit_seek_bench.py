@@ -0,0 +1,94 @@
+'''
+Seek latency in a scene commit log (15_scene_commit/commit_log.py) against the keyframe spacing.
+
+    python benchmarks/commit_seek_bench.py --spacing 1 10 50 100 250
+    python benchmarks/commit_seek_bench.py --log output/python/15_scene_commit/scene/commits.log
+
+Without --log, a log of --frames frames is written for every spacing: the keyframes are
+the scene.json, the commits hold its position and transform attributes moved a bit, like
+the commits of a simulated scene. Only the decoding is timed then. With --log (and uipc),
+the seeks go through load_frame on a log recorded by server_run.py, SceneIO included.
+'''
+import sys
+import json
+import time
+import random
+import tempfile
+import argparse as ap
+import pathlib as pl
+
+this_folder = pl.Path(__file__).absolute().parent
+python_root = this_folder.parent
+sys.path.append(str(python_root / '15_scene_commit'))
+
+import numpy as np
+from commit_log import CommitLog, CommitLogWriter, KEYFRAME, load_frame
+
+def percentile(values, q):
+    return float(np.percentile(values, q * 100)) if values else 0.0
+
+def moving_attributes(scene):
+    # the attributes a simulation changes every frame
+    attributes = scene['__data__']['geometry_atlas']['__data__']['attributes']
+    return [(i, a['__data__']['values']) for i, a in enumerate(attributes)
+            if a['__meta__']['type'] in ('Vector3', 'Matrix4x4') and len(a['__data__']['values']) > 1]
+
+def synthetic_log(path, scene, frames, spacing):
+    moving = moving_attributes(scene)
+    rng = np.random.default_rng(0)
+    with CommitLogWriter(path, reset=True) as log:
+        log.append_json(0, scene, KEYFRAME)
+        for f in range(1, frames + 1):
+            commit = {'frame': f, 'attributes': [[i, (np.asarray(v) + rng.normal(0, 1e-3, np.shape(v))).tolist()] for i, v in moving]}
+            log.append_json(f, commit)
+            if f % spacing == 0:
+                log.append_json(f, scene, KEYFRAME)
+
+def decode_seek(log, frame):
+    keyframe, commits = log.seek_plan(frame)
+    log.json(keyframe, KEYFRAME)
+    for f in commits:
+        log.json(f)
+
+def measure(log, seek, seeks):
+    frames = log.frames()
+    random.seed(0)
+    latencies = []
+    for frame in random.choices(frames, k=seeks):
+        t = time.perf_counter()
+        seek(log, frame)
+        latencies.append(time.perf_counter() - t)
+    return latencies
+
+def report(name, log_path, latencies):
+    size = pl.Path(log_path).stat().st_size / 2**20
+    print(f'{name:>10}{size:>12.1f}{np.mean(latencies) * 1000:>12.2f}{percentile(latencies, 0.95) * 1000:>12.2f}{max(latencies) * 1000:>12.2f}')
+
+def main():
+    parser = ap.ArgumentParser(description='Seek latency against keyframe spacing')
+    parser.add_argument('--scene', type=str, default=str(python_root / '14_load_scene' / 'scene.json'), help='Scene used for the synthetic keyframes')
+    parser.add_argument('--log', type=str, help='Measure a log recorded by server_run.py instead, needs uipc')
+    parser.add_argument('--frames', type=int, default=1000, help='Frames of the synthetic log')
+    parser.add_argument('--spacing', type=int, nargs='+', default=[1, 10, 25, 50, 100, 250], help='Keyframe spacings')
+    parser.add_argument('--seeks', type=int, default=50, help='Random seeks per spacing')
+    args = parser.parse_args()
+
+    print(f'{"spacing":>10}{"log [MiB]":>12}{"mean [ms]":>12}{"p95 [ms]":>12}{"max [ms]":>12}')
+    if args.log:
+        log = CommitLog(args.log)
+        spacing = log.keyframe_list[1] - log.keyframe_list[0] if len(log.keyframe_list) > 1 else len(log)
+        report(spacing, args.log, measure(log, lambda log, frame: load_frame(log, frame), args.seeks))
+        return
+
+    with open(args.scene, 'r') as f:
+        scene = json.load(f)
+    with tempfile.TemporaryDirectory() as tmp:
+        for spacing in args.spacing:
+            path = f'{tmp}/commits_{spacing}.log'
+            synthetic_log(path, scene, args.frames, spacing)
+            log = CommitLog(path)
+            report(spacing, path, measure(log, decode_seek, args.seeks))
+            log.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import sys
+import time
+import tempfile
+import argparse as ap
+import pathlib as pl
+import numpy as np
+
+this_folder = pl.Path(__file__).absolute().parent
+sys.path.append(str(this_folder.parent))
+
+from samples_common.gmsh import read_msh
+
+def grid_tetmesh(n):
+    # n^3 cubes, each split into 6 tetrahedra around the main diagonal
+    g = np.arange(n + 1, dtype=np.float64) / n
+    V = np.stack(np.meshgrid(g, g, g, indexing='ij'), axis=-1).reshape(-1, 3)
+    i, j, k = np.meshgrid(np.arange(n), np.arange(n), np.arange(n), indexing='ij')
+    base = (i * (n + 1) + j) * (n + 1) + k
+    corner = lambda a, b, c: (base + (a * (n + 1) + b) * (n + 1) + c).ravel()
+    c = [corner(a, b, cc) for a in (0, 1) for b in (0, 1) for cc in (0, 1)]
+    tets = [(0, 1, 3, 7), (0, 1, 5, 7), (0, 2, 3, 7), (0, 2, 6, 7), (0, 4, 5, 7), (0, 4, 6, 7)]
+    T = np.concatenate([np.stack([c[a], c[b], c[d], c[e]], axis=1) for a, b, d, e in tets])
+    return V, T
+
+def write_msh(path, V, T):
+    with open(path, 'w') as f:
+        f.write('$MeshFormat\n2.2 0 8\n$EndMeshFormat\n')
+        f.write(f'$Nodes\n{len(V)}\n')
+        np.savetxt(f, np.column_stack([np.arange(1, len(V) + 1), V]), fmt='%d %.9g %.9g %.9g')
+        f.write('$EndNodes\n')
+        f.write(f'$Elements\n{len(T)}\n')
+        ids = np.arange(1, len(T) + 1)
+        np.savetxt(f, np.column_stack([ids, np.full_like(ids, 4), np.zeros_like(ids), T + 1]), fmt='%d')
+        f.write('$EndElements\n')
+
+def read_msh_lines(path):
+    # line by line reference, the way a straightforward reader would do it
+    V, T = [], []
+    with open(path, 'r') as f:
+        lines = iter(f)
+        for line in lines:
+            if line.startswith('$Nodes'):
+                for _ in range(int(next(lines))):
+                    p = next(lines).split()
+                    V.append((float(p[1]), float(p[2]), float(p[3])))
+            elif line.startswith('$Elements'):
+                for _ in range(int(next(lines))):
+                    p = next(lines).split()
+                    if p[1] == '4':
+                        begin = 3 + int(p[2])
+                        T.append([int(x) - 1 for x in p[begin:begin + 4]])
+    return np.array(V), np.array(T, dtype=np.int32)
+
+def best_of(f, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - t)
+    return min(times)
+
+def main():
+    parser = ap.ArgumentParser(description='Scaling of the vectorized .msh reader')
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=[10, 30, 60, 100], help='Grid resolutions, a grid has 6*n^3 tets')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Runs per case, the best one is reported')
+    parser.add_argument('--no-lines', action='store_true', help='Skip the line by line reference reader')
+    args = parser.parse_args()
+
+    readers = {'read_msh': read_msh}
+    if not args.no_lines:
+        readers['line by line'] = read_msh_lines
+    try:
+        from uipc.geometry import SimplicialComplexIO
+        io = SimplicialComplexIO()
+        readers['SimplicialComplexIO'] = lambda p: io.read(p)
+    except ImportError:
+        print('uipc not found, skip SimplicialComplexIO')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'{"tets":>10}{"MiB":>8}' + ''.join(f'{name + " [s]":>26}' for name in readers))
+        for n in args.sizes:
+            V, T = grid_tetmesh(n)
+            path = str(pl.Path(tmp) / f'grid{n}.msh')
+            write_msh(path, V, T)
+            V2, T2 = read_msh(path)
+            assert np.array_equal(T2, T) and np.allclose(V2, V)
+            size = pl.Path(path).stat().st_size / 2**20
+            row = f'{len(T):>10}{size:>8.1f}'
+            for name, reader in readers.items():
+                row += f'{best_of(lambda: reader(path), args.repeat):>26.3f}'
+            print(row)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import tempfile
+import argparse as ap
+import pathlib as pl
+import numpy as np
+
+this_folder = pl.Path(__file__).absolute().parent
+python_root = this_folder.parent
+sys.path.append(str(python_root))
+
+from samples_common import AssetDir, SURFACE, ORIENTED_SURFACE
+
+# the meshes the samples spend the most time on at startup
+MESHES = [
+    (f'{AssetDir.tetmesh_path()}/ball.msh', ORIENTED_SURFACE),
+    (f'{AssetDir.tetmesh_path()}/bunny0.msh', ORIENTED_SURFACE),
+    (str(python_root / '24_sewing_pattern' / 'body.obj'), SURFACE),
+]
+
+# runs in a fresh process, like a sample at startup; with dump, saves the positions,
+# topology and labels of the mesh read
+CHILD = '''
+import sys, json, time
+sys.path.append({root!r})
+t = time.perf_counter()
+from samples_common import read_mesh
+sc = read_mesh({path!r}, steps={steps!r})
+read = time.perf_counter() - t
+if({dump!r} is not None):
+    import numpy as np
+    from samples_common.mesh_cache import _to_arrays
+    np.savez({dump!r}, **_to_arrays(sc))
+print(json.dumps({{'read': read}}))
+'''
+
+def run(path, steps, disk_cache, dump=None):
+    env = dict(os.environ)
+    env['UIPC_SAMPLES_MESH_CACHE'] = '1' if disk_cache else '0'
+    code = CHILD.format(root=str(python_root), path=path, steps=steps, dump=dump)
+    t = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', code], env=env, check=True, capture_output=True, text=True).stdout
+    wall = time.perf_counter() - t
+    return json.loads(out.strip().splitlines()[-1])['read'], wall
+
+def check(path, steps):
+    '''
+    :return: the differences between the mesh read without the cache and from it
+    '''
+    from samples_common.mesh_cache import clear_disk_cache
+    with tempfile.TemporaryDirectory() as tmp:
+        source, cached = f'{tmp}/source.npz', f'{tmp}/cached.npz'
+        run(path, steps, False, source)
+        clear_disk_cache()
+        run(path, steps, True)
+        run(path, steps, True, cached)
+        with np.load(source) as a, np.load(cached) as b:
+            problems = [f'{k} missing' for k in sorted(set(a.files) ^ set(b.files))]
+            for k in sorted(set(a.files) & set(b.files)):
+                if a[k].dtype != b[k].dtype:
+                    problems.append(f'{k} {a[k].dtype} != {b[k].dtype}')
+                elif not np.array_equal(a[k], b[k]):
+                    problems.append(f'{k} values differ')
+    return problems
+
+def main():
+    parser = ap.ArgumentParser(description='Cold vs warm startup of samples_common.read_mesh')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Runs per case, the best one is reported')
+    args = parser.parse_args()
+
+    from samples_common.mesh_cache import clear_disk_cache
+
+    print(f'{"mesh":<14}{"case":<10}{"read [ms]":>12}{"process [ms]":>15}')
+    for path, steps in MESHES:
+        name = pl.Path(path).name
+        cases = {}
+        cases['no cache'] = min(run(path, steps, False) for _ in range(args.repeat))
+        cold = []
+        for _ in range(args.repeat):
+            clear_disk_cache()
+            cold.append(run(path, steps, True))
+        cases['cold'] = min(cold)
+        cases['warm'] = min(run(path, steps, True) for _ in range(args.repeat))
+        for case, (read, wall) in cases.items():
+            print(f'{name:<14}{case:<10}{read * 1000:>12.2f}{wall * 1000:>15.2f}')
+        # the warm read must give the mesh the source gives, topology, labels and their types
+        problems = check(path, steps)
+        print(f'{name:<14}{"cached == source":<26}{"ok" if not problems else ", ".join(problems):>11}')
+
+if __name__ == '__main__':
+    main()
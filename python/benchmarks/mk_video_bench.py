@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+import argparse as ap
+import pathlib as pl
+
+import numpy as np
+import imageio as mio
+
+this_folder = pl.Path(__file__).absolute().parent
+mk_video = this_folder.parent / 'mk_video.py'
+
+def make_frames(folder, count, width, height):
+    # smooth gradients + noise, so the png files and the video are not trivially compressible
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)
+    base = (x[None, :] + y[:, None]) / 2
+    for i in range(count):
+        img = np.empty((height, width, 3), dtype=np.uint8)
+        img[..., 0] = (base + i) % 256
+        img[..., 1] = (base * 0.5 + 3 * i) % 256
+        img[..., 2] = rng.integers(0, 256, (height, width), dtype=np.uint8)
+        mio.v2.imwrite(folder / f'{i}.png', img)
+
+def run(folder, output, extra_args):
+    cmd = [sys.executable, str(mk_video), str(folder), '30', '-o', str(output)] + extra_args
+    t = time.perf_counter()
+    p = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    # wait4 gives the resource usage of this child only
+    _, status, usage = os.wait4(p.pid, 0)
+    wall = time.perf_counter() - t
+    if status != 0:
+        raise RuntimeError(f'{cmd} failed with status {status}')
+    # ru_maxrss is in KiB on Linux
+    return wall, usage.ru_maxrss / 1024
+
+def main():
+    parser = ap.ArgumentParser(description='Compare peak RSS and wall time of mk_video.py modes')
+    parser.add_argument('-n', '--frames', type=int, default=300, help='Number of synthetic frames')
+    parser.add_argument('--width', type=int, default=1920, help='Frame width')
+    parser.add_argument('--height', type=int, default=1080, help='Frame height')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help='Decoding threads of the parallel mode')
+    parser.add_argument('-k', '--keep', type=str, default=None, help='Keep the synthetic frames in this folder')
+    args = parser.parse_args()
+
+    tmp = pl.Path(tempfile.mkdtemp(prefix='mk_video_bench_'))
+    frames = pl.Path(args.keep) if args.keep else tmp / 'frames'
+    frames.mkdir(parents=True, exist_ok=True)
+    if not any(frames.iterdir()):
+        print(f'Writing {args.frames} frames of {args.width}x{args.height} to {frames}')
+        make_frames(frames, args.frames, args.width, args.height)
+
+    modes = {
+        'in-memory': [],
+        'stream': ['--stream'],
+        f'stream -j{args.workers}': ['--stream', '-j', str(args.workers)],
+    }
+
+    print(f'{"mode":<16}{"wall [s]":>12}{"peak RSS [MiB]":>18}')
+    try:
+        for name, extra in modes.items():
+            wall, rss = run(frames, tmp / f'{name}.mp4', extra)
+            print(f'{name:<16}{wall:>12.2f}{rss:>18.1f}')
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == '__main__':
+    main()
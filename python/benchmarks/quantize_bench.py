@@ -0,0 +1,226 @@
+'''
+Compression ratio and largest error of the quantized commits of 15_scene_commit/quantized_commit.py
+against the exact ATTRIBUTES commits, on the bunny cloth and wrecking balls scenes.
+
+    python benchmarks/quantize_bench.py --tolerance 1e-3 1e-4 1e-5
+    python benchmarks/quantize_bench.py --uipc -n 100
+
+Without --uipc the motion is synthetic, on the meshes and body placements of the scenes:
+- bunny_cloth: the 20x20 cloth falls and waves, the fixed bunny does not move
+- wrecking_balls: the links and balls of wrecking_ball.json swing about their fixed links,
+  the cube wall is knocked over after a while
+With --uipc (and a GPU) the scenes run through `samples.run` and IncrementalSnapshot commits
+every frame. The error of a transform is measured on the corners of its geometry's bounding
+box, the points it moves; the bound is the tolerance times the scene's bounding box diagonal.
+'''
+import sys
+import json
+import time
+import zlib
+import argparse as ap
+import pathlib as pl
+import numpy as np
+
+this_folder = pl.Path(__file__).absolute().parent
+python_root = this_folder.parent
+sys.path.append(str(python_root))
+sys.path.append(str(python_root / '15_scene_commit'))
+
+from samples_common import AssetDir
+from samples_common.gmsh import read_msh
+from incremental_snapshot import DirtyTracker, encode_attributes
+from quantized_commit import QuantizedEncoder, decode_quantized, dequantize, scene_bounds
+
+KEYFRAME_INTERVAL = 50
+
+def read_obj_positions(path):
+    with open(path, 'r') as f:
+        return np.array([line.split()[1:4] for line in f if line.startswith('v ')], dtype=np.float64)
+
+def rotation(axis, angle):
+    # rotation matrices about x, y or z, angle may be an array
+    c, s = np.cos(angle), np.sin(angle)
+    r = np.zeros(np.shape(angle) + (3, 3))
+    i, j = [(1, 2), (0, 2), (0, 1)][axis]
+    r[..., axis, axis] = 1
+    r[..., i, i] = c
+    r[..., j, j] = c
+    r[..., i, j] = -s
+    r[..., j, i] = s
+    return r
+
+def transform(r, t):
+    m = np.zeros(np.shape(r)[:-2] + (4, 4))
+    m[..., :3, :3] = r
+    m[..., :3, 3] = t
+    m[..., 3, 3] = 1
+    return m
+
+def bunny_cloth(frames):
+    '''
+    :return: (geometries, frames), geometries {id: {attribute: array}} at frame 0,
+             frames a generator of the same per frame
+    '''
+    cloth = read_obj_positions(f'{AssetDir.trimesh_path()}/grid20x20.obj') * 2.0 + 1.0
+    bunny = read_msh(f'{AssetDir.tetmesh_path()}/bunny0.msh')[0]
+    bunny_t = transform(np.eye(3), [1, 0, 1])[None]
+    geometries = {0: {'vertices/position': cloth[:, :, None].copy()},
+                  1: {'vertices/position': bunny[:, :, None], 'instances/transform': bunny_t}}
+
+    def frames_of():
+        x = cloth[:, 0] - cloth[:, 0].min()
+        for f in range(1, frames + 1):
+            t = f * 0.01
+            p = cloth.copy()
+            p[:, 1] -= min(0.5 * 9.8 * t * t, 1.2)
+            p[:, 1] += 0.05 * np.sin(4 * x - 3 * t) * min(t, 1.0)
+            geometries[0]['vertices/position'] = p[:, :, None]
+            yield geometries
+    return geometries, frames_of()
+
+def wrecking_balls(frames):
+    folder = python_root / '6_wrecking_balls'
+    with open(folder / 'wrecking_ball.json', 'r') as f:
+        bodies = json.load(f)
+    meshes = {name: read_msh(f'{AssetDir.tetmesh_path()}/{name}')[0] for name in {b['mesh'] for b in bodies}}
+    rest = []
+    for b in bodies:
+        rx, ry, rz = np.radians(b.get('rotation', [0, 0, 0]))
+        r = rotation(2, rz) @ rotation(1, ry) @ rotation(0, rx)
+        rest.append(transform(r, b['position']))
+    rest = np.array(rest)
+    fixed = np.array([b.get('is_dof_fixed', False) for b in bodies])
+    chain = np.array([b['mesh'] != 'cube.msh' for b in bodies]) & ~fixed
+    wall = np.array([b['mesh'] == 'cube.msh' for b in bodies])
+    pivot = rest[fixed][:, :3, 3].mean(axis=0) if fixed.any() else np.zeros(3)
+    geometries = {i: {'vertices/position': meshes[b['mesh']][:, :, None], 'instances/transform': rest[i:i + 1].copy()}
+                  for i, b in enumerate(bodies)}
+
+    def frames_of():
+        rng = np.random.default_rng(0)
+        spin = rng.normal(0, 1, (len(bodies), 3))
+        for f in range(1, frames + 1):
+            t = f * 0.033
+            # the chains swing about z through the fixed links
+            swing = transform(rotation(2, 0.6 * np.cos(1.5 * t) - 0.6), 0)
+            to_pivot = transform(np.eye(3), -pivot)
+            from_pivot = transform(np.eye(3), pivot)
+            moved = from_pivot @ swing @ to_pivot @ rest
+            # the wall is knocked over from t = 1
+            knock = max(t - 1.0, 0.0)
+            tumble = transform(rotation(0, 0.3 * knock * spin[:, 0]) @ rotation(2, 0.3 * knock * spin[:, 2]), 0)
+            fallen = tumble @ rest
+            fallen[:, :3, 3] = rest[:, :3, 3] + knock * np.stack([spin[:, 0], np.full(len(bodies), -2 * min(knock, 1.0)), spin[:, 2]], axis=1)
+            for i in range(len(bodies)):
+                if chain[i]:
+                    geometries[i]['instances/transform'] = moved[i:i + 1]
+                elif wall[i] and knock > 0:
+                    geometries[i]['instances/transform'] = fallen[i:i + 1]
+            yield geometries
+    return geometries, frames_of()
+
+def synthetic_commits(scene, frames):
+    # [(gid, name, array)] of the changed arrays per frame, like IncrementalSnapshot
+    geometries, frames_of = {'bunny_cloth': bunny_cloth, 'wrecking_balls': wrecking_balls}[scene](frames)
+
+    def tracked(geometries):
+        return [((gid, name), a) for gid, geo in geometries.items() for name, a in geo.items()]
+
+    tracker = DirtyTracker()
+    tracker.update(tracked(geometries))
+    bounds = scene_bounds(tracked(geometries))
+    positions = {gid: geo['vertices/position'] for gid, geo in geometries.items()}
+    commits = []
+    for g in frames_of:
+        commits.append([(gid, name, a) for (gid, name), a in tracker.update(tracked(g))])
+    return bounds, positions, commits
+
+def uipc_commits(scene, frames, backend):
+    import samples
+    from uipc.backend import SceneVisitor
+    from incremental_snapshot import IncrementalSnapshot, decode_attributes, tracked_arrays
+    samples.set_headless(True)
+    state = {}
+    commits = []
+
+    def on_frame(world, s):
+        if 'snapshot' not in state:
+            # the first frame is committed against the initial state
+            tracked = [(key, np.array(a)) for key, a in tracked_arrays(SceneVisitor(s))]
+            state['bounds'] = scene_bounds(tracked)
+            state['positions'] = {gid: a for (gid, name), a in tracked if name == 'vertices/position'}
+            state['snapshot'] = IncrementalSnapshot(s)
+        commits.append([(gid, name, np.array(a)) for gid, name, a in decode_attributes(state['snapshot'].commit())])
+
+    name = {'bunny_cloth': '11_bunny_cloth', 'wrecking_balls': '6_wrecking_balls'}[scene]
+    samples.run(name, frames, backend, on_frame=on_frame)
+    return state['bounds'], state['positions'], commits
+
+def corners(positions):
+    p = np.asarray(positions).reshape(-1, 3)
+    lo, hi = p.min(axis=0), p.max(axis=0)
+    return np.array([[x, y, z] for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])])
+
+def measure(commits, bounds, positions, tolerance, codec):
+    lo, hi, extents = bounds
+    error = tolerance * float(np.linalg.norm(hi - lo))
+    encoder = QuantizedEncoder(error, extents, codec)
+    # what the client has, what the deltas go on top of
+    client = {}
+    # the points a transform moves, homogeneous
+    points = {gid: np.hstack([corners(p), np.ones((8, 1))]) for gid, p in positions.items()}
+    raw = packed = quantized = 0
+    encode_time = 0.0
+    max_error = 0.0
+    for f, entries in enumerate(commits, 1):
+        payload = encode_attributes(entries)
+        raw += len(payload)
+        packed += len(zlib.compress(payload, 6))
+        t = time.perf_counter()
+        q = encoder.encode(entries)
+        encode_time += time.perf_counter() - t
+        quantized += len(q)
+        exact_values = {(gid, name): a for gid, name, a in entries}
+        for gid, name, a in dequantize(decode_quantized(q), lambda gid, name: client[(gid, name)]):
+            client[(gid, name)] = a
+            exact = exact_values[(gid, name)]
+            if name.endswith('transform'):
+                # the error of the points the transform moves
+                d = np.abs(np.einsum('nij,kj->nki', a - exact, points[gid])[..., :3]).max()
+            else:
+                d = np.abs(a - exact).max()
+            max_error = max(max_error, float(d))
+        if f % KEYFRAME_INTERVAL == 0:
+            # the client may load the keyframe, the values are exact again
+            encoder.reset()
+            client.clear()
+    return {'raw': raw, 'zlib': packed, 'quantized': quantized, 'error': error,
+            'max_error': max_error, 'encode_ms': encode_time / len(commits) * 1000}
+
+def main():
+    parser = ap.ArgumentParser(description='Quantized commits: compression ratio and largest error')
+    parser.add_argument('--scenes', type=str, nargs='+', default=['bunny_cloth', 'wrecking_balls'], help='Scenes')
+    parser.add_argument('--tolerance', type=float, nargs='+', default=[1e-3, 1e-4, 1e-5], help='Error bound relative to the bounding box diagonal')
+    parser.add_argument('--codec', type=str, nargs='+', default=['zlib', 'lzma'], help='Entropy coder')
+    parser.add_argument('-n', '--frames', type=int, default=200, help='Frames per scene')
+    parser.add_argument('--uipc', action='store_true', help='Simulate the scenes with uipc instead of the synthetic motion')
+    parser.add_argument('-b', '--backend', type=str, default='cuda', help='uipc backend with --uipc')
+    args = parser.parse_args()
+
+    print(f'{"scene":>16}{"tolerance":>11}{"codec":>6}{"f64 [KiB/f]":>13}{"zlib f64":>10}{"quantized":>11}'
+          f'{"ratio":>8}{"vs zlib":>9}{"max error":>12}{"bound":>11}{"error/bound":>13}{"enc [ms]":>10}')
+    for scene in args.scenes:
+        if args.uipc:
+            bounds, positions, commits = uipc_commits(scene, args.frames, args.backend)
+        else:
+            bounds, positions, commits = synthetic_commits(scene, args.frames)
+        frames = len(commits)
+        for tolerance in args.tolerance:
+            for codec in args.codec:
+                r = measure(commits, bounds, positions, tolerance, codec)
+                print(f'{scene:>16}{tolerance:>11.0e}{codec:>6}{r["raw"] / frames / 1024:>13.1f}{r["zlib"] / frames / 1024:>10.1f}'
+                      f'{r["quantized"] / frames / 1024:>11.1f}{r["raw"] / r["quantized"]:>8.1f}{r["zlib"] / r["quantized"]:>9.1f}'
+                      f'{r["max_error"]:>12.2e}{r["error"]:>11.2e}{r["max_error"] / r["error"]:>13.4f}{r["encode_ms"]:>10.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+'''
+Benchmark suite over the sample scenes, with stored baselines.
+
+    python benchmarks/scene_bench.py run -n 100 -o benchmarks/baselines/my_change.json
+    python benchmarks/scene_bench.py compare benchmarks/baselines/main.json benchmarks/baselines/my_change.json
+
+Every scene runs in its own process, so the peak RSS is per scene.
+'''
+import sys
+import json
+import time
+import platform
+import resource
+import subprocess
+import argparse as ap
+import pathlib as pl
+
+this_folder = pl.Path(__file__).absolute().parent
+python_root = this_folder.parent
+sys.path.append(str(python_root))
+
+SCHEMA_VERSION = 1
+SCENES = ['6_wrecking_balls', '11_bunny_cloth', '8_screw_and_nut', '24_sewing_pattern']
+PHASES = ['build_scene', 'init', 'advance', 'retrieve', 'write_surface']
+
+def percentile(values, q):
+    s = sorted(values)
+    if not s:
+        return 0.0
+    k = (len(s) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(s) - 1)
+    return s[lo] + (s[hi] - s[lo]) * (k - lo)
+
+def stats(values):
+    return {
+        'count': len(values),
+        'total': sum(values),
+        'mean': sum(values) / len(values) if values else 0.0,
+        'p50': percentile(values, 0.5),
+        'p95': percentile(values, 0.95),
+        'max': max(values, default=0.0),
+    }
+
+def run_one(scene, frames, backend):
+    # runs in the child process
+    import samples
+    from uipc import Logger
+    from uipc.core import SceneIO
+    Logger.set_level(Logger.Level.Error)
+    samples.set_headless(True)
+
+    out = pl.Path(samples.workspace(scene)) / 'bench'
+    out.mkdir(parents=True, exist_ok=True)
+    export = []
+    sio = None
+    def on_frame(world, s):
+        nonlocal sio
+        if sio is None:
+            sio = SceneIO(s)
+        t = time.perf_counter()
+        sio.write_surface(str(out / f'surface{world.frame()}.obj'))
+        export.append(time.perf_counter() - t)
+
+    timings = samples.run(scene, frames, backend, on_frame=on_frame)
+    per_frame = timings['per_frame']
+    phases = {
+        'build_scene': stats([timings['build_scene']]),
+        'init': stats([timings['init']]),
+        'advance': stats([r['advance'] for r in per_frame]),
+        'retrieve': stats([r['retrieve'] for r in per_frame]),
+        'write_surface': stats(export),
+    }
+    # ru_maxrss is in KiB on Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {'phases': phases, 'peak_rss_mib': rss}
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=this_folder,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def run_suite(scenes, frames, backend):
+    results = {}
+    for scene in scenes:
+        print(f'Running {scene} for {frames} frames ...')
+        cmd = [sys.executable, __file__, '_one', scene, '-n', str(frames), '-b', backend]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        # the scene setups print their config, the result is the last line
+        results[scene] = json.loads(out.strip().splitlines()[-1])
+    try:
+        import uipc
+        uipc_version = getattr(uipc, '__version__', 'unknown')
+    except ImportError:
+        uipc_version = 'unknown'
+    return {
+        'schema_version': SCHEMA_VERSION,
+        'revision': git_revision(),
+        'uipc_version': uipc_version,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {'node': platform.node(), 'platform': platform.platform(), 'python': platform.python_version()},
+        'backend': backend,
+        'frames': frames,
+        'scenes': results,
+    }
+
+def compare(base, new, threshold, metric):
+    if base['schema_version'] != new['schema_version']:
+        raise ValueError(f'schema version {base["schema_version"]} != {new["schema_version"]}')
+    if base['frames'] != new['frames']:
+        print(f'warning: frame counts differ ({base["frames"]} vs {new["frames"]})')
+
+    regressions = []
+    print(f'{"scene":<20}{"phase":<16}{"base":>12}{"new":>12}{"change":>10}')
+    for scene, b in base['scenes'].items():
+        n = new['scenes'].get(scene)
+        if n is None:
+            print(f'{scene:<20}missing in new results')
+            continue
+        rows = [(phase, b['phases'][phase][metric], n['phases'][phase][metric])
+                for phase in PHASES if phase in b['phases'] and phase in n['phases']]
+        rows.append(('peak_rss_mib', b['peak_rss_mib'], n['peak_rss_mib']))
+        for phase, old, cur in rows:
+            change = (cur - old) / old if old > 0 else 0.0
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressions.append((scene, phase, change))
+            print(f'{scene:<20}{phase:<16}{old:>12.4f}{cur:>12.4f}{change:>+10.1%}{flag}')
+    return regressions
+
+def main():
+    parser = ap.ArgumentParser(description='Benchmark suite over the sample scenes')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('run', help='Run the suite and save the results')
+    p.add_argument('-s', '--scenes', nargs='+', default=SCENES, help='Scenes to run')
+    p.add_argument('-n', '--frames', type=int, default=100, help='Frames per scene')
+    p.add_argument('-b', '--backend', type=str, default='cuda', help='Engine backend')
+    p.add_argument('-o', '--output', type=str, default=None, help='Result file, default: benchmarks/baselines/<revision>.json')
+
+    p = sub.add_parser('compare', help='Compare two result files')
+    p.add_argument('base', type=str, help='Baseline result file')
+    p.add_argument('new', type=str, help='New result file')
+    p.add_argument('-t', '--threshold', type=float, default=0.1, help='Relative slowdown flagged as regression')
+    p.add_argument('-m', '--metric', type=str, default='mean', choices=['total', 'mean', 'p50', 'p95', 'max'], help='Statistic to compare')
+
+    p = sub.add_parser('_one', help=ap.SUPPRESS)
+    p.add_argument('scene', type=str)
+    p.add_argument('-n', '--frames', type=int, default=100)
+    p.add_argument('-b', '--backend', type=str, default='cuda')
+
+    args = parser.parse_args()
+
+    if args.command == '_one':
+        print(json.dumps(run_one(args.scene, args.frames, args.backend)))
+    elif args.command == 'run':
+        results = run_suite(args.scenes, args.frames, args.backend)
+        output = pl.Path(args.output or this_folder / 'baselines' / f'{results["revision"]}.json')
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f'Results saved to {output}')
+    elif args.command == 'compare':
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        regressions = compare(base, new, args.threshold, args.metric)
+        if regressions:
+            print(f'{len(regressions)} regression(s) beyond {args.threshold:.0%}')
+            sys.exit(1)
+        print('No regression')
+
+if __name__ == '__main__':
+    main()
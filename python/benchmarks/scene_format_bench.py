@@ -0,0 +1,109 @@
+'''
+Size and load time of a scene as SceneIO json, SceneIO bson and the columnar format
+of 14_load_scene/scene_columnar.py.
+
+    python benchmarks/scene_format_bench.py
+    python benchmarks/scene_format_bench.py path/to/scene.json --scale 1 100 1000
+
+--scale k tiles every attribute array k times, the result is not a valid scene for
+uipc but has the size of one with k times more vertices (SceneIO rows are skipped).
+The columns column counts the arrays stored in columns.bin / the distinct ones written,
+the other arrays stay inline in structure.json.
+'''
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse as ap
+import pathlib as pl
+
+this_folder = pl.Path(__file__).absolute().parent
+python_root = this_folder.parent
+sys.path.append(str(python_root / '14_load_scene'))
+
+from scene_columnar import convert, load_scene, ColumnarScene
+
+def best_of(repeat, fn):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+def folder_size(path):
+    path = pl.Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+def scaled(scene_path, k, dst):
+    with open(scene_path, 'r') as f:
+        scene = json.load(f)
+    for attr in scene['__data__']['geometry_atlas']['__data__']['attributes']:
+        if attr['__meta__']['type'] != 'string':
+            attr['__data__']['values'] = attr['__data__']['values'] * k
+    with open(dst, 'w') as f:
+        json.dump(scene, f, indent=4)
+
+def touch_columnar(folder):
+    # parse the structure and read every array once
+    scene = ColumnarScene(folder)
+    for i in range(len(scene.attributes)):
+        v = scene.values(i)
+        if not isinstance(v, list):
+            v.sum()
+
+def main():
+    parser = ap.ArgumentParser(description='SceneIO json/bson vs the columnar scene format')
+    parser.add_argument('scene', nargs='?', default=str(python_root / '14_load_scene' / 'scene.json'), help='A scene.json saved by SceneIO')
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 100], help='Tile the attribute arrays k times')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Runs per case, the best one is reported')
+    args = parser.parse_args()
+
+    try:
+        from uipc.core import SceneIO
+    except ImportError:
+        SceneIO = None
+        print('uipc is not installed, skipping the SceneIO rows')
+
+    tmp = pl.Path(tempfile.mkdtemp())
+    try:
+        print(f'{"scale":>6} {"format":<22}{"size [KiB]":>12}{"load [ms]":>12}{"columns":>10}')
+        for k in args.scale:
+            src = tmp / f'scene_x{k}.json'
+            if k == 1:
+                shutil.copy(args.scene, src)
+            else:
+                scaled(args.scene, k, src)
+            columnar = tmp / f'scene_x{k}.columnar'
+            columns = '{}/{}'.format(*convert(src, columnar))
+            plain = tmp / f'scene_x{k}.plain'
+            plain_columns = '{}/{}'.format(*convert(src, plain, dedup=False))
+
+            def load_json():
+                with open(src, 'r') as f:
+                    json.load(f)
+
+            rows = [
+                ('json (json.load)', folder_size(src), best_of(args.repeat, load_json), ''),
+                ('columnar', folder_size(columnar), best_of(args.repeat, lambda: ColumnarScene(columnar)), columns),
+                ('columnar, read all', folder_size(columnar), best_of(args.repeat, lambda: touch_columnar(columnar)), columns),
+                ('columnar, no dedup', folder_size(plain), best_of(args.repeat, lambda: touch_columnar(plain)), plain_columns),
+                ('columnar -> json', folder_size(columnar), best_of(args.repeat, lambda: ColumnarScene(columnar).to_dict()), columns),
+                ('no dedup -> json', folder_size(plain), best_of(args.repeat, lambda: ColumnarScene(plain).to_dict()), plain_columns),
+            ]
+            if SceneIO is not None and k == 1:
+                bson = tmp / 'scene.bson'
+                SceneIO(SceneIO.load(str(src))).save(str(bson))
+                rows.append(('SceneIO json', folder_size(src), best_of(args.repeat, lambda: SceneIO.load(str(src))), ''))
+                rows.append(('SceneIO bson', folder_size(bson), best_of(args.repeat, lambda: SceneIO.load(str(bson))), ''))
+                rows.append(('columnar -> Scene', folder_size(columnar), best_of(args.repeat, lambda: load_scene(columnar)), columns))
+            for name, size, t, c in rows:
+                print(f'{k:>6} {name:<22}{size / 1024:>12.1f}{t * 1000:>12.2f}{c:>10}')
+    finally:
+        shutil.rmtree(tmp)
+
+if __name__ == '__main__':
+    main()
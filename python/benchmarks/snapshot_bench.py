@@ -0,0 +1,138 @@
+'''
+Per-frame snapshot + commit cost against scene size, full copies against the dirty
+tracking of 15_scene_commit/incremental_snapshot.py.
+
+    python benchmarks/snapshot_bench.py --geometries 10 100 1000 --vertices 1000
+
+Synthetic: the scene is a set of position arrays, --moving of them change every frame.
+- full copy: copy every array after the frame and compare against the previous copy,
+  what SceneSnapshot + commit amount to
+- compare: compare every array with its last committed values, copy only the changed ones
+- hash: hash every array, copy only the changed ones
+
+With uipc installed, --uipc also times SceneSnapshot(scene) + SceneIO.commit_to_json against
+IncrementalSnapshot.commit on scenes of cubes.
+'''
+import sys
+import time
+import argparse as ap
+import pathlib as pl
+import numpy as np
+
+this_folder = pl.Path(__file__).absolute().parent
+python_root = this_folder.parent
+sys.path.append(str(python_root))
+sys.path.append(str(python_root / '15_scene_commit'))
+
+from incremental_snapshot import DirtyTracker, encode_attributes
+
+def step(arrays, moving, rng):
+    for a in arrays[:moving]:
+        a += rng.normal(0, 1e-3, a.shape)
+
+def full_copy(arrays, frames, moving):
+    rng = np.random.default_rng(0)
+    previous = [a.copy() for a in arrays]
+    total = 0.0
+    committed = 0
+    for _ in range(frames):
+        step(arrays, moving, rng)
+        t = time.perf_counter()
+        changed = [(i, a) for i, (a, p) in enumerate(zip(arrays, previous)) if not np.array_equal(a, p)]
+        payload = encode_attributes([(i, 'vertices/position', a) for i, a in changed])
+        previous = [a.copy() for a in arrays]
+        total += time.perf_counter() - t
+        committed += len(payload)
+    return total / frames, committed / frames
+
+def tracked(arrays, frames, moving, mode):
+    rng = np.random.default_rng(0)
+    tracker = DirtyTracker(mode)
+    tracker.update(enumerate(arrays))
+    total = 0.0
+    committed = 0
+    for _ in range(frames):
+        step(arrays, moving, rng)
+        t = time.perf_counter()
+        changed = tracker.update(enumerate(arrays))
+        payload = encode_attributes([(i, 'vertices/position', a) for i, a in changed])
+        total += time.perf_counter() - t
+        committed += len(payload)
+    return total / frames, committed / frames
+
+def uipc_scene(n):
+    from uipc import view, Transform, Vector3
+    from uipc.core import Scene
+    from uipc.geometry import SimplicialComplexIO, label_surface
+    from uipc.constitution import AffineBodyConstitution
+    from samples_common import AssetDir
+    scene = Scene(Scene.default_config())
+    abd = AffineBodyConstitution()
+    cube = SimplicialComplexIO().read(f'{AssetDir.tetmesh_path()}/cube.msh')
+    label_surface(cube)
+    obj = scene.objects().create('cubes')
+    for i in range(n):
+        mesh = cube.copy()
+        abd.apply_to(mesh, 1e8)
+        t = Transform.Identity()
+        t.translate(Vector3.UnitX() * 1.2 * i)
+        view(mesh.transforms())[:] = t.matrix()
+        obj.geometries().create(mesh)
+    return scene
+
+def bench_uipc(counts, frames):
+    from uipc import view
+    from uipc.core import SceneIO, SceneSnapshot
+    from uipc.backend import SceneVisitor
+    from incremental_snapshot import IncrementalSnapshot
+    print(f'{"cubes":>8}{"SceneSnapshot+commit [ms]":>28}{"compare [ms]":>14}{"hash [ms]":>12}')
+    for n in counts:
+        scene = uipc_scene(n)
+        scene_io = SceneIO(scene)
+        slots = list(SceneVisitor(scene).geometries())
+
+        def move():
+            for slot in slots[:max(1, len(slots) // 10)]:
+                view(slot.geometry().transforms())[:, 0, 3] += 1e-3
+
+        ss = SceneSnapshot(scene)
+        t = time.perf_counter()
+        for _ in range(frames):
+            move()
+            scene_io.commit_to_json(ss)
+            ss = SceneSnapshot(scene)
+        full = (time.perf_counter() - t) / frames
+        incremental = []
+        for mode in ('compare', 'hash'):
+            snapshot = IncrementalSnapshot(scene, mode=mode)
+            t = time.perf_counter()
+            for _ in range(frames):
+                move()
+                snapshot.commit()
+            incremental.append((time.perf_counter() - t) / frames)
+        print(f'{n:>8}{full * 1000:>28.2f}{incremental[0] * 1000:>14.2f}{incremental[1] * 1000:>12.2f}')
+
+def main():
+    parser = ap.ArgumentParser(description='Snapshot + commit cost against scene size')
+    parser.add_argument('--geometries', type=int, nargs='+', default=[10, 100, 1000], help='Number of geometries')
+    parser.add_argument('--vertices', type=int, default=1000, help='Vertices per geometry')
+    parser.add_argument('--moving', type=float, default=0.1, help='Fraction of the geometries that move every frame')
+    parser.add_argument('-n', '--frames', type=int, default=20, help='Frames per case')
+    parser.add_argument('--uipc', action='store_true', help='Also time SceneSnapshot on real scenes of cubes')
+    args = parser.parse_args()
+
+    print(f'{"geometries":>10}{"MiB":>8}{"full copy [ms]":>16}{"compare [ms]":>14}{"hash [ms]":>12}{"commit [KiB]":>14}')
+    for g in args.geometries:
+        arrays = [np.random.default_rng(i).random((args.vertices, 3, 1)) for i in range(g)]
+        moving = max(1, int(g * args.moving))
+        size = sum(a.nbytes for a in arrays) / 2**20
+        t_full, committed = full_copy(arrays, args.frames, moving)
+        t_compare, _ = tracked(arrays, args.frames, moving, 'compare')
+        t_hash, _ = tracked(arrays, args.frames, moving, 'hash')
+        print(f'{g:>10}{size:>8.1f}{t_full * 1000:>16.2f}{t_compare * 1000:>14.2f}{t_hash * 1000:>12.2f}{committed / 1024:>14.1f}')
+
+    if args.uipc:
+        bench_uipc(args.geometries, args.frames)
+
+if __name__ == '__main__':
+    main()
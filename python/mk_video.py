@@ -1,52 +1,172 @@
 import imageio as mio
 import argparse as ap
 import pathlib as pl
+import collections
+import concurrent.futures as cf
+import json
+import subprocess
+
+def find_images(folder):
+    file_dict = {}
+    # find all files in the folder
+    for f in pl.Path(folder).iterdir():
+        if f.is_file():
+            file_dict[int(f.stem)] = f
+
+    # sort the files by number
+    sorted_files = []
+    for i in sorted(file_dict.keys()):
+        sorted_files.append((i,file_dict[i]))
+    return sorted_files
+
+def read_image(f, verbose):
+    if(verbose):
+        print(f'Reading {f}')
+    return mio.v2.imread(f)
+
+def decode_images(sorted_files, workers, verbose):
+    # yield the decoded images in the order of sorted_files
+    if(workers <= 1):
+        for i, f in sorted_files:
+            yield read_image(f, verbose)
+        return
+
+    # at most `depth` images are in flight or waiting to be consumed,
+    # the deque keeps them in frame order whatever order they finish in
+    depth = 2 * workers
+    pending = collections.deque()
+    files = iter(sorted_files)
+    with cf.ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, f in files:
+            pending.append(pool.submit(read_image, f, verbose))
+            if(len(pending) >= depth):
+                break
+        while pending:
+            image = pending.popleft().result()
+            for i, f in files:
+                pending.append(pool.submit(read_image, f, verbose))
+                break
+            yield image
+
+def save_in_memory(sorted_files, output, fps, workers, verbose):
+    # decode every image first, then encode them all at once
+    images = list(decode_images(sorted_files, workers, verbose))
+    mio.mimsave(output, images, fps=fps)
+
+def save_streaming(sorted_files, output, fps, workers, verbose):
+    # open the writer once and append each frame as soon as it is decoded,
+    # so only the prefetched frames are alive at any time
+    with mio.get_writer(output, fps=fps) as writer:
+        for image in decode_images(sorted_files, workers, verbose):
+            writer.append_data(image)
+
+def segment_entry(files, name):
+    return {
+        'first': files[0][0],
+        'last': files[-1][0],
+        'count': len(files),
+        'file': name,
+    }
+
+def write_manifest(path, manifest):
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=4)
+
+def save_incremental(sorted_files, output, fps, workers, segment_size, verbose):
+    # encode the frames in fixed-size segments, a manifest records which
+    # frame ranges every segment holds, so a re-run only encodes the
+    # segments whose frames changed (usually just the new tail)
+    segment_dir = output.parent / f'{output.name}.segments'
+    segment_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = segment_dir / 'manifest.json'
+
+    manifest = {'fps': fps, 'segment_size': segment_size, 'segments': []}
+    if manifest_path.exists():
+        with open(manifest_path, 'r') as f:
+            old = json.load(f)
+        # segments are only reusable if they were cut and encoded the same way
+        if old['fps'] == fps and old['segment_size'] == segment_size:
+            manifest = old
+
+    old_segments = manifest['segments']
+    segments = []
+    for k in range(0, len(sorted_files), segment_size):
+        files = sorted_files[k:k + segment_size]
+        name = f'{len(segments)}{output.suffix}'
+        entry = segment_entry(files, name)
+        if(len(segments) < len(old_segments) and old_segments[len(segments)] == entry
+           and (segment_dir / name).exists()):
+            if(verbose):
+                print(f'Reuse segment {name} [{entry["first"]}, {entry["last"]}]')
+        else:
+            print(f'Encode segment {name} [{entry["first"]}, {entry["last"]}]')
+            save_streaming(files, segment_dir / name, fps, workers, verbose)
+        segments.append(entry)
+        # write the manifest after every segment, an interrupted run resumes from here
+        manifest['segments'] = segments + old_segments[len(segments):]
+        write_manifest(manifest_path, manifest)
+
+    # drop segments left over from a longer previous run
+    for entry in old_segments[len(segments):]:
+        (segment_dir / entry['file']).unlink(missing_ok=True)
+    manifest['segments'] = segments
+    write_manifest(manifest_path, manifest)
+
+    join_segments(segment_dir, segments, output)
+
+def join_segments(segment_dir, segments, output):
+    # concatenate without re-encoding, all the segments share codec and fps
+    import imageio_ffmpeg
+    concat_list = segment_dir / 'concat.txt'
+    with open(concat_list, 'w') as f:
+        for entry in segments:
+            f.write(f"file '{(segment_dir / entry['file']).as_posix()}'\n")
+    cmd = [imageio_ffmpeg.get_ffmpeg_exe(), '-y', '-loglevel', 'error',
+           '-f', 'concat', '-safe', '0', '-i', str(concat_list), '-c', 'copy', str(output)]
+    subprocess.run(cmd, check=True)
 
 def main():
     parser = ap.ArgumentParser(description='Create video from images')
     parser.add_argument('folder', type=str, help='Folder contains images with numbered name. e.g. 0.png, 1.png, 2.png')
     parser.add_argument('fps', type=int, help='Frames per second')
     parser.add_argument('-o', '--output', type=str, help='Output video file', default='output.mp4')
+    parser.add_argument('-s', '--stream', action='store_true', help='Streaming mode, encode frames while decoding them (bounded memory)')
+    parser.add_argument('-j', '--workers', type=int, help='Number of decoding threads', default=1)
+    parser.add_argument('-i', '--incremental', action='store_true', help='Incremental mode, only encode the segments with new frames and join them')
+    parser.add_argument('--segment-size', type=int, help='Number of frames per segment in incremental mode', default=100)
     parser.add_argument('-v', '--verbose', action='store_true', help='Verbose mode')
     args = parser.parse_args()
     folder = args.folder
     output = args.output
     fps = args.fps
+    stream = args.stream
+    workers = args.workers
+    incremental = args.incremental
+    segment_size = args.segment_size
     verbose = args.verbose
-    
+
     output = pl.Path(output).absolute()
-    
-    file_dict = {}
-    images = []
-    # find all files in the folder
-    for f in pl.Path(folder).iterdir():
-        if f.is_file():
-            file_dict[int(f.stem)] = f
 
-    # sort the files by number
-    sorted_files = []
-    for i in sorted(file_dict.keys()):
-        sorted_files.append((i,file_dict[i]))
-    
+    sorted_files = find_images(folder)
+
     # print the min and max number
-    print(f'Number of images: {len(images)}')
+    print(f'Number of images: {len(sorted_files)}')
     print(f'Min number: {sorted_files[0][0]}')
     print(f'Max number: {sorted_files[-1][0]}')
-    
-    # read the images
-    for i, f in sorted_files:
-        if(verbose):
-            print(f'Reading {f}')
-        images.append(mio.v2.imread(f))
-    
+
     if(verbose):
         print(f'Image files:')
         for i,f in sorted_files:
             print(f'[{i}]: {f}')
-    
-    mio.mimsave(output, images, fps=fps)
-    
+
+    if(incremental):
+        save_incremental(sorted_files, output, fps, workers, segment_size, verbose)
+    elif(stream):
+        save_streaming(sorted_files, output, fps, workers, verbose)
+    else:
+        save_in_memory(sorted_files, output, fps, workers, verbose)
+
     print(f'Video saved to {output}')
-    
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
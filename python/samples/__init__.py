@@ -0,0 +1,96 @@
+'''
+Headless access to the samples.
+
+A sample can be driven by `python -m samples` when its folder has a
+`scene_setup.py` with a `build_scene()` returning the `Scene`, without
+any GUI import.
+'''
+import sys
+import json
+import time
+import pathlib
+import importlib.util
+
+_python_root = pathlib.Path(__file__).resolve().parent.parent
+if str(_python_root) not in sys.path:
+    sys.path.append(str(_python_root))
+
+from samples_common import AssetDir, is_headless, set_headless, timing
+
+SETUP_FILE = 'scene_setup.py'
+
+def available():
+    '''
+    Names of the samples that provide a scene_setup.py, in sample order.
+    '''
+    dirs = [d for d in _python_root.iterdir() if (d / SETUP_FILE).is_file()]
+    return [d.name for d in sorted(dirs, key=lambda d: int(d.name.split('_')[0]))]
+
+def sample_dir(name):
+    # accept the folder name or just its number, e.g. '6' for '6_wrecking_balls'
+    for n in available():
+        if name == n or name == n.split('_')[0]:
+            return _python_root / n
+    raise KeyError(f'no sample {name!r} with a {SETUP_FILE}, available: {", ".join(available())}')
+
+def load_scene_setup(name):
+    d = sample_dir(name)
+    # the setup imports `asset_dir` from its own folder
+    if str(d) not in sys.path:
+        sys.path.insert(0, str(d))
+    spec = importlib.util.spec_from_file_location(f'_samples_{d.name}_scene_setup', d / SETUP_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def workspace(name):
+    return AssetDir.output_path(sample_dir(name) / 'run')
+
+def run(name, frames, backend='cuda', workspace_dir=None, on_frame=None):
+    '''
+    Build the scene of a sample and advance it `frames` times in a tight loop.
+
+    :param on_frame: optional callback(world, scene) after every retrieve()
+    :return: a dict with the wall time of the setup phases, of every frame and the
+             samples_common.timing phases (e.g. read_mesh) recorded during the run
+    '''
+    from uipc.core import Engine, World
+
+    workspace_dir = workspace(name) if workspace_dir is None else workspace_dir
+    setup = load_scene_setup(name)
+
+    t = time.perf_counter()
+    scene = setup.build_scene()
+    build = time.perf_counter() - t
+
+    engine = Engine(backend, workspace_dir)
+    world = World(engine)
+    t = time.perf_counter()
+    world.init(scene)
+    init = time.perf_counter() - t
+
+    records = []
+    for _ in range(frames):
+        t0 = time.perf_counter()
+        world.advance()
+        t1 = time.perf_counter()
+        world.retrieve()
+        t2 = time.perf_counter()
+        if on_frame is not None:
+            on_frame(world, scene)
+        records.append({'frame': world.frame(), 'advance': t1 - t0, 'retrieve': t2 - t1})
+
+    return {
+        'sample': sample_dir(name).name,
+        'backend': backend,
+        'frames': frames,
+        'build_scene': build,
+        'init': init,
+        'per_frame': records,
+        'phases': timing.summary(),
+    }
+
+def write_timings(path, timings):
+    pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(timings, f, indent=4)
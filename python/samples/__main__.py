@@ -0,0 +1,79 @@
+import argparse as ap
+
+from . import available, sample_dir, run, workspace, write_timings, set_headless
+from samples_common import TimerCollector
+
+def run_gui(name, frames, backend, on_frame=None):
+    # only imported when a display is wanted
+    import polyscope as ps
+    from uipc.gui import SceneGUI
+
+    sgui = None
+    def show(world, scene):
+        nonlocal sgui
+        if on_frame is not None:
+            on_frame(world, scene)
+        if sgui is None:
+            ps.init()
+            sgui = SceneGUI(scene, 'split')
+            sgui.register()
+        sgui.update()
+        ps.frame_tick()
+
+    return run(name, frames, backend, on_frame=show)
+
+def main():
+    parser = ap.ArgumentParser(prog='python -m samples', description='Run the samples without their GUI loop')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('list', help='List the samples that can be run')
+
+    p = sub.add_parser('run', help='Build a sample scene and advance it')
+    p.add_argument('sample', type=str, help='Sample folder name or number, e.g. 6_wrecking_balls or 6')
+    p.add_argument('-n', '--frames', type=int, default=100, help='Number of frames to advance')
+    p.add_argument('-b', '--backend', type=str, default='cuda', help='Engine backend')
+    p.add_argument('--headless', action='store_true', help='Do not import polyscope, no window at all')
+    p.add_argument('--timers', action='store_true', help='Capture the uipc Timer tree every frame, see samples_common.timer_trace')
+    p.add_argument('-o', '--output', type=str, default=None, help='Per-frame timings JSON, default: <workspace>/timings.json')
+
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for name in available():
+            print(name)
+        return
+
+    try:
+        sample_dir(args.sample)
+    except KeyError as e:
+        parser.error(e.args[0])
+
+    set_headless(args.headless)
+    collector = None
+    on_frame = None
+    if args.timers:
+        from uipc import Timer
+        Timer.enable_all()
+        collector = TimerCollector()
+        on_frame = lambda world, scene: collector.capture(world.frame())
+
+    if args.headless:
+        timings = run(args.sample, args.frames, args.backend, on_frame=on_frame)
+    else:
+        timings = run_gui(args.sample, args.frames, args.backend, on_frame)
+
+    output = args.output or f'{workspace(args.sample)}/timings.json'
+    write_timings(output, timings)
+
+    advance = sum(r['advance'] for r in timings['per_frame'])
+    retrieve = sum(r['retrieve'] for r in timings['per_frame'])
+    print(f'{timings["sample"]}: {args.frames} frames, build {timings["build_scene"]:.3f}s, init {timings["init"]:.3f}s, '
+          f'advance {advance:.3f}s, retrieve {retrieve:.3f}s')
+    if args.frames > 0:
+        print(f'throughput: {args.frames / (advance + retrieve):.2f} frames/s')
+    print(f'timings saved to {output}')
+    if collector is not None:
+        collector.save(workspace(args.sample))
+
+if __name__ == '__main__':
+    main()
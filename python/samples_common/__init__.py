@@ -0,0 +1,12 @@
+from .asset_dir import AssetDir
+from .headless import is_headless, set_headless
+from .timing import Timing, timing
+from .timer_trace import TimerCollector
+
+SURFACE = ('label_surface',)
+ORIENTED_SURFACE = ('label_surface', 'label_triangle_orient', 'flip_inward_triangles')
+
+def read_mesh(path, pre_transform=None, steps=ORIENTED_SURFACE):
+    # uipc is only imported when a mesh is actually read
+    from .mesh_cache import read_mesh as _read_mesh
+    return _read_mesh(path, pre_transform, steps)
@@ -0,0 +1,57 @@
+import os
+import pathlib
+import functools
+
+class AssetDir:
+    this_file = pathlib.Path(os.path.dirname(__file__)).resolve()
+    _python_root = this_file.parent
+    _repo_root = _python_root.parent
+    _output_path = (_repo_root / 'output').resolve()
+    _assets_path = (_repo_root / 'assets').resolve()
+    _tetmesh_path = _assets_path / 'sim_data' / 'tetmesh'
+    _trimesh_path = _assets_path / 'sim_data' / 'trimesh'
+
+    @staticmethod
+    def asset_path():
+        return str(AssetDir._assets_path)
+
+    @staticmethod
+    def tetmesh_path():
+        return str(AssetDir._tetmesh_path)
+
+    @staticmethod
+    def trimesh_path():
+        return str(AssetDir._trimesh_path)
+
+    @staticmethod
+    def output_path(file):
+        return AssetDir._output_dir(str(pathlib.Path(file).absolute()))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _output_dir(file):
+        # get the relative path from the repo root to the file
+        relative_path = pathlib.Path(file).relative_to(AssetDir._repo_root)
+        # construct the output path, created once per process
+        output_dir = AssetDir._output_path / relative_path / ''
+        os.makedirs(output_dir, exist_ok=True)
+        return str(output_dir)
+
+    @staticmethod
+    def binary_mesh(path):
+        '''
+        The .uipcmesh file converted from the mesh at `path` (see samples_common.mesh_bin),
+        None if there is none or it is older than the source.
+        '''
+        src = pathlib.Path(path)
+        dst = src.with_suffix('.uipcmesh')
+        try:
+            if dst.stat().st_mtime >= src.stat().st_mtime:
+                return str(dst)
+        except FileNotFoundError:
+            pass
+        return None
+
+    @staticmethod
+    def folder(file):
+        return pathlib.Path(file).absolute().parent
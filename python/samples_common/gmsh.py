@@ -0,0 +1,99 @@
+'''
+Vectorized reader of Gmsh 2.2 ASCII .msh files.
+
+The $Nodes and $Elements blocks are sliced out of the file and converted
+to numpy arrays in bulk, no Python code runs per node or per element
+unless the element block mixes element types or tag counts.
+'''
+import warnings
+import numpy as np
+
+# element type -> number of nodes, see the Gmsh 2.2 file format
+_ELEMENT_NODES = {1: 2, 2: 3, 3: 4, 4: 4, 5: 8, 6: 6, 7: 5, 8: 3, 9: 6, 10: 9, 11: 10, 15: 1}
+TRIANGLE = 2
+TETRAHEDRON = 4
+
+def _block(text, name):
+    begin = text.find(f'${name}')
+    if begin < 0:
+        raise ValueError(f'no ${name} block')
+    begin = text.index('\n', begin) + 1
+    end = text.index(f'$End{name}', begin)
+    # first line is the count
+    nl = text.index('\n', begin)
+    return int(text[begin:nl]), text[nl + 1:end]
+
+def _numbers(s, dtype):
+    with warnings.catch_warnings():
+        # numpy only deprecates the binary mode of fromstring, text mode is the fast path
+        warnings.simplefilter('ignore', DeprecationWarning)
+        return np.fromstring(s, dtype=dtype, sep=' ')
+
+def _elements(flat, count, element_type):
+    size = _ELEMENT_NODES[element_type]
+    if count == 0:
+        return np.empty((0, size), dtype=np.int64)
+
+    # fast path: every element has the same type and tag count, so the rows have equal width
+    etype, ntags = int(flat[1]), int(flat[2])
+    width = 3 + ntags + _ELEMENT_NODES[etype]
+    if flat.size == count * width:
+        rows = flat.reshape(count, width)
+        if (rows[:, 1] == etype).all() and (rows[:, 2] == ntags).all():
+            if etype != element_type:
+                return np.empty((0, size), dtype=np.int64)
+            return rows[:, 3 + ntags:]
+
+    # mixed types or tag counts: walk the rows to find where each element starts
+    selected = []
+    i = 0
+    for _ in range(count):
+        etype, ntags = int(flat[i + 1]), int(flat[i + 2])
+        begin = i + 3 + ntags
+        i = begin + _ELEMENT_NODES[etype]
+        if etype == element_type:
+            selected.append(begin)
+    begins = np.asarray(selected, dtype=np.int64)
+    return flat[begins[:, None] + np.arange(size)]
+
+def read_msh(path, element_type=None):
+    '''
+    Read a Gmsh 2.2 ASCII mesh.
+
+    :param element_type: TETRAHEDRON or TRIANGLE; None takes the tetrahedra of the file,
+                         its triangles if it has no tetrahedra
+    :return: (V, S), V is a float64 (n, 3) array of positions,
+             S an int32 array of zero-based vertex indices of the elements,
+             (m, 4) for tetrahedra, (m, 3) for triangles, ready for uipc.geometry.tetmesh / trimesh.
+    '''
+    with open(path, 'r') as f:
+        text = f.read()
+
+    version = text[text.index('$MeshFormat') + len('$MeshFormat'):].split(maxsplit=1)[0]
+    if not version.startswith('2'):
+        raise ValueError(f'{path}: only Gmsh 2.x ASCII files are supported, got version {version}')
+
+    node_count, node_text = _block(text, 'Nodes')
+    nodes = _numbers(node_text, np.float64).reshape(node_count, 4)
+    ids = nodes[:, 0].astype(np.int64)
+    V = np.ascontiguousarray(nodes[:, 1:])
+
+    element_count, element_text = _block(text, 'Elements')
+    flat = _numbers(element_text, np.int64)
+    if element_type is None:
+        S = _elements(flat, element_count, TETRAHEDRON)
+        if S.shape[0] == 0:
+            S = _elements(flat, element_count, TRIANGLE)
+        if S.shape[0] == 0:
+            raise ValueError(f'{path}: no tetrahedra or triangles')
+    else:
+        S = _elements(flat, element_count, element_type)
+
+    # node ids are usually 1..n, otherwise map them to rows of V
+    if ids.size and (ids[0] != 1 or ids[-1] != ids.size or not (np.diff(ids) == 1).all()):
+        lookup = np.full(ids.max() + 1, -1, dtype=np.int64)
+        lookup[ids] = np.arange(ids.size)
+        S = lookup[S]
+    else:
+        S = S - 1
+    return V, np.ascontiguousarray(S, dtype=np.int32)
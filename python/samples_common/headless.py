@@ -0,0 +1,11 @@
+import os
+
+# set UIPC_SAMPLES_HEADLESS=1 to run the samples without a display
+_ENV = 'UIPC_SAMPLES_HEADLESS'
+
+def is_headless():
+    return os.environ.get(_ENV, '0') not in ('', '0', 'false', 'False')
+
+def set_headless(value=True):
+    # also visible to the child processes started after this call
+    os.environ[_ENV] = '1' if value else '0'
@@ -0,0 +1,113 @@
+'''
+Binary mesh container (.uipcmesh), a memory-mapped alternative to the ASCII .msh/.obj assets.
+
+Layout (little endian):
+
+    header, 64 bytes: magic b'UIPCMESH', u32 version, u32 vertices per simplex (3: triangle, 4: tetrahedron),
+                      u64 vertex count, u64 simplex count, zero padding
+    float64[vertex count, 3]             vertex positions
+    int32[simplex count, vertices per simplex] simplices
+
+Convert the assets with:
+
+    python -m samples_common.mesh_bin assets/sim_data
+
+Each .uipcmesh is written next to its source. Only read_mesh (mesh_cache.py) loads them, samples that
+call SimplicialComplexIO().read() directly keep reading the ASCII files.
+'''
+import struct
+import pathlib
+import argparse as ap
+import numpy as np
+
+from .gmsh import read_msh
+
+SUFFIX = '.uipcmesh'
+_MAGIC = b'UIPCMESH'
+_VERSION = 1
+_HEADER = struct.Struct('<8sIIQQ')
+_HEADER_SIZE = 64
+
+def binary_path(path):
+    return pathlib.Path(path).with_suffix(SUFFIX)
+
+def write_mesh_bin(path, V, S):
+    V = np.ascontiguousarray(V, dtype=np.float64).reshape(-1, 3)
+    S = np.ascontiguousarray(S, dtype=np.int32)
+    S = S.reshape(S.shape[0], -1)
+    header = _HEADER.pack(_MAGIC, _VERSION, S.shape[1], V.shape[0], S.shape[0])
+    with open(path, 'wb') as f:
+        f.write(header.ljust(_HEADER_SIZE, b'\0'))
+        f.write(V.tobytes())
+        f.write(S.tobytes())
+
+def load_mesh_bin(path):
+    '''
+    Return (V, S) as read-only numpy.memmap views of the file, nothing is parsed or copied.
+    '''
+    with open(path, 'rb') as f:
+        magic, version, simplex_size, nv, ns = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f'{path} is not a version {_VERSION} {SUFFIX} file')
+    V = np.memmap(path, dtype=np.float64, mode='r', offset=_HEADER_SIZE, shape=(nv, 3))
+    S = np.memmap(path, dtype=np.int32, mode='r', offset=_HEADER_SIZE + V.nbytes, shape=(ns, simplex_size))
+    return V, S
+
+def build_simplicial_complex(V, S, pre_transform=None):
+    '''
+    Build a tetmesh/trimesh from vertex and simplex arrays, applying the pre-transform like SimplicialComplexIO does.
+    '''
+    from uipc.geometry import tetmesh, trimesh
+    if pre_transform is not None:
+        M = np.asarray(pre_transform.matrix())
+        V = V @ M[:3, :3].T + M[:3, 3]
+    if S.shape[1] == 4:
+        return tetmesh(V, S)
+    if S.shape[1] == 3:
+        return trimesh(V, S)
+    raise ValueError(f'unsupported simplex size {S.shape[1]}')
+
+def read_simplicial_complex(path, pre_transform=None):
+    V, S = load_mesh_bin(path)
+    return build_simplicial_complex(V, S, pre_transform)
+
+def _source_arrays(path):
+    if pathlib.Path(path).suffix == '.msh':
+        try:
+            return read_msh(path)
+        except ValueError:
+            # not Gmsh 2.x, or neither tetrahedra nor triangles, SimplicialComplexIO reads it
+            pass
+    from uipc import view
+    from uipc.geometry import SimplicialComplexIO
+    sc = SimplicialComplexIO().read(str(path))
+    slots = sc.tetrahedra() if sc.tetrahedra().size() > 0 else sc.triangles()
+    V = view(sc.positions()).reshape(-1, 3)
+    S = view(slots.topo())
+    return V, S.reshape(S.shape[0], -1)
+
+def convert(src, dst=None):
+    src = pathlib.Path(src)
+    dst = binary_path(src) if dst is None else pathlib.Path(dst)
+    V, S = _source_arrays(src)
+    write_mesh_bin(dst, V, S)
+    return dst
+
+def main():
+    parser = ap.ArgumentParser(description=f'Convert .msh/.obj meshes to {SUFFIX}, next to the source files')
+    parser.add_argument('paths', nargs='+', help='Mesh files or folders (searched recursively)')
+    parser.add_argument('-f', '--force', action='store_true', help='Convert even if the binary file is up to date')
+    args = parser.parse_args()
+
+    for p in args.paths:
+        p = pathlib.Path(p)
+        files = [p] if p.is_file() else sorted(f for ext in ('*.msh', '*.obj') for f in p.rglob(ext))
+        for f in files:
+            dst = binary_path(f)
+            if not args.force and dst.exists() and dst.stat().st_mtime >= f.stat().st_mtime:
+                print(f'Up to date {dst}')
+                continue
+            print(f'Convert {f} -> {convert(f, dst)}')
+
+if __name__ == '__main__':
+    main()
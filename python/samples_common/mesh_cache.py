@@ -0,0 +1,169 @@
+import os
+import hashlib
+import pathlib
+import numpy as np
+from uipc import view, Transform
+from uipc.geometry import SimplicialComplexIO, tetmesh, trimesh, label_surface, label_triangle_orient, flip_inward_triangles
+
+from . import ORIENTED_SURFACE
+from .asset_dir import AssetDir
+from .gmsh import read_msh
+from .mesh_bin import build_simplicial_complex, read_simplicial_complex
+from .timing import timing
+
+# bump it when the layout of the cached files changes
+_VERSION = 1
+
+# set UIPC_SAMPLES_MESH_CACHE=0 to always read and process the source asset
+_ENV = 'UIPC_SAMPLES_MESH_CACHE'
+_cache_dir = AssetDir._output_path / 'mesh_cache'
+
+_STEPS = {
+    'label_surface': label_surface,
+    'label_triangle_orient': label_triangle_orient,
+    'flip_inward_triangles': flip_inward_triangles,
+}
+
+# the attributes created by the steps above, restored from the cache
+_ATTRIBUTES = {
+    'vertices': ('is_surf',),
+    'edges': ('is_surf', 'is_facet'),
+    'triangles': ('is_surf', 'is_facet', 'orient'),
+    'tetrahedra': (),
+}
+
+# (path, pre_transform, steps) -> SimplicialComplex, shared by the whole process
+_meshes = {}
+
+def _transform_key(pre_transform):
+    if pre_transform is None:
+        return None
+    return tuple(float(x) for x in np.asarray(pre_transform.matrix()).flatten())
+
+def _disk_enabled():
+    return os.environ.get(_ENV, '1') not in ('', '0', 'false', 'False')
+
+def _cache_file(path, transform_key, steps):
+    h = hashlib.sha256()
+    h.update(f'{_VERSION}|{transform_key}|{",".join(steps)}|'.encode())
+    with open(path, 'rb') as f:
+        h.update(f.read())
+    return _cache_dir / f'{pathlib.Path(path).stem}-{h.hexdigest()[:32]}.npz'
+
+def _apply_steps(sc, steps):
+    for step in steps:
+        result = _STEPS[step](sc)
+        # flip_inward_triangles returns a new mesh, the labels work in place
+        if result is not None:
+            sc = result
+    return sc
+
+def _to_arrays(sc):
+    arrays = {'positions': view(sc.positions()).reshape(-1, 3).copy()}
+    for name, attrs in _ATTRIBUTES.items():
+        slots = getattr(sc, name)()
+        if slots.size() == 0:
+            continue
+        topo = view(slots.topo())
+        arrays[f'{name}__topo'] = topo.reshape(topo.shape[0], -1).astype(np.int32)
+        for attr in attrs:
+            a = slots.find(attr)
+            if a is not None:
+                arrays[f'{name}__{attr}'] = np.asarray(view(a)).copy()
+    return arrays
+
+def _from_arrays(arrays):
+    V = arrays['positions']
+    if 'tetrahedra__topo' in arrays:
+        sc = tetmesh(V, arrays['tetrahedra__topo'])
+    else:
+        sc = trimesh(V, arrays['triangles__topo'])
+    for name, attrs in _ATTRIBUTES.items():
+        if f'{name}__topo' not in arrays:
+            continue
+        slots = getattr(sc, name)()
+        topo = arrays[f'{name}__topo']
+        if slots.size() != topo.shape[0]:
+            slots.resize(topo.shape[0])
+        v = view(slots.topo())
+        v[:] = topo.reshape(v.shape)
+        for attr in attrs:
+            key = f'{name}__{attr}'
+            if key not in arrays:
+                continue
+            a = slots.find(attr)
+            if a is None:
+                # the default value sets the type, it must be the one the processing step created
+                a = slots.create(attr, arrays[key].dtype.type(0))
+            v = view(a)
+            if v.dtype != arrays[key].dtype:
+                raise TypeError(f'{name}.{attr} is {v.dtype}, the cached one {arrays[key].dtype}')
+            v[:] = arrays[key].reshape(v.shape)
+    return sc
+
+def _cacheable(sc):
+    return sc.tetrahedra().size() > 0 or (sc.dim() == 2 and sc.triangles().size() > 0)
+
+def _read(path, pre_transform, transform_key, steps):
+    cache_file = _cache_file(path, transform_key, steps) if _disk_enabled() else None
+    if cache_file is not None and cache_file.exists():
+        with timing('read_mesh_cached'):
+            with np.load(cache_file) as data:
+                return _from_arrays({k: data[k] for k in data.files})
+
+    with timing('read_mesh'):
+        binary = AssetDir.binary_mesh(path)
+        if binary is not None:
+            sc = read_simplicial_complex(binary, pre_transform)
+        else:
+            sc = None
+            if path.endswith('.msh'):
+                try:
+                    V, S = read_msh(path)
+                    sc = build_simplicial_complex(V, S, pre_transform)
+                except ValueError:
+                    # not Gmsh 2.x, or neither tetrahedra nor triangles
+                    pass
+            if sc is None:
+                io = SimplicialComplexIO() if pre_transform is None else SimplicialComplexIO(pre_transform)
+                sc = io.read(path)
+        sc = _apply_steps(sc, steps)
+
+    if cache_file is not None and _cacheable(sc):
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first, a concurrent reader never sees a partial file
+        tmp = cache_file.with_suffix(f'.{os.getpid()}.tmp.npz')
+        np.savez(tmp, **_to_arrays(sc))
+        os.replace(tmp, cache_file)
+    return sc
+
+def process_surface(sc):
+    return _apply_steps(sc, ORIENTED_SURFACE)
+
+def read_mesh(path, pre_transform: Transform = None, steps=ORIENTED_SURFACE):
+    '''
+    Read a mesh and apply the processing steps to it.
+
+    .msh files are parsed with gmsh.read_msh and built with tetmesh from their tetrahedra,
+    or with trimesh from their triangles if they have no tetrahedra; a converted .uipcmesh
+    of the asset is used when there is one (see mesh_bin). Files read_msh cannot take
+    (not Gmsh 2.x ASCII, no tetrahedra or triangles) and other formats go through
+    SimplicialComplexIO. The pre-transform is applied to the positions either way.
+
+    The result is cached on disk (output/mesh_cache), keyed by the content of the asset,
+    the pre-transform and the steps, so the parsing and labeling only happen once.
+    Inside a process every mesh is read once, a copy is returned on every call.
+    '''
+    path = str(pathlib.Path(path).resolve())
+    steps = tuple(steps)
+    transform_key = _transform_key(pre_transform)
+    key = (path, transform_key, steps)
+    sc = _meshes.get(key)
+    if sc is None:
+        sc = _read(path, pre_transform, transform_key, steps)
+        _meshes[key] = sc
+    return sc.copy()
+
+def clear_disk_cache():
+    for f in _cache_dir.glob('*.npz'):
+        f.unlink()
@@ -0,0 +1,124 @@
+'''
+Collect the uipc Timer tree every frame, instead of scraping Timer.report() text.
+
+    collector = TimerCollector()
+    ...
+    world.advance()
+    world.retrieve()
+    collector.capture(world.frame())
+    ...
+    collector.save(workspace)
+
+save() writes
+    timer_trace.json    Chrome trace events, open it in Perfetto (ui.perfetto.dev) or chrome://tracing
+    timers.npz          per-frame columns: frame, timer (index into names), duration [s], count
+    timer_summary.json  p50/p95/max duration of every timer over all captured frames
+'''
+import json
+import pathlib
+import numpy as np
+
+class TimerCollector:
+    def __init__(self):
+        self.names = []
+        self._ids = {}
+        self._frame = []
+        self._timer = []
+        self._duration = []
+        self._count = []
+        self._events = []
+        self._cursor = 0.0
+
+    def capture(self, frame, report=None):
+        '''
+        Record the timer tree of one frame. `report` is the result of Timer.report_as_json(),
+        taken from the global Timer when omitted (which also resets it, like Timer.report()).
+        '''
+        if report is None:
+            from uipc import Timer
+            report = Timer.report_as_json()
+        roots = report if isinstance(report, list) else [report]
+        start = self._cursor
+        for root in roots:
+            start += self._walk(root, '', frame, start)
+        self._cursor = start
+
+    def _walk(self, node, parent, frame, start):
+        name = str(node.get('name', '?'))
+        children = node.get('children') or []
+        path = f'{parent}/{name}' if parent else name
+        # container nodes may carry no duration of their own
+        duration = node.get('duration')
+        if duration is None:
+            duration = sum(float(c.get('duration') or 0.0) for c in children)
+        duration = float(duration)
+        count = int(node.get('count', 1))
+
+        timer = self._ids.get(path)
+        if timer is None:
+            timer = self._ids[path] = len(self.names)
+            self.names.append(path)
+        self._frame.append(frame)
+        self._timer.append(timer)
+        self._duration.append(duration)
+        self._count.append(count)
+
+        # the tree has no start times, children are laid out one after another inside their parent
+        self._events.append({
+            'name': name, 'cat': 'uipc', 'ph': 'X', 'pid': 0, 'tid': 0,
+            'ts': start * 1e6, 'dur': duration * 1e6,
+            'args': {'frame': frame, 'count': count, 'path': path},
+        })
+        child_start = start
+        for c in children:
+            child_start += self._walk(c, path, frame, child_start)
+        return duration
+
+    def columns(self):
+        return {
+            'frame': np.asarray(self._frame, dtype=np.int32),
+            'timer': np.asarray(self._timer, dtype=np.int32),
+            'duration': np.asarray(self._duration, dtype=np.float64),
+            'count': np.asarray(self._count, dtype=np.int32),
+        }
+
+    def summary(self):
+        c = self.columns()
+        result = {}
+        for timer, name in enumerate(self.names):
+            d = c['duration'][c['timer'] == timer]
+            result[name] = {
+                'frames': int(d.size),
+                'p50': float(np.percentile(d, 50)),
+                'p95': float(np.percentile(d, 95)),
+                'max': float(d.max()),
+                'total': float(d.sum()),
+            }
+        return result
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self._events, 'displayTimeUnit': 'ms'}, f)
+
+    def write_columns(self, path):
+        np.savez_compressed(path, names=np.asarray(self.names, dtype=str), **self.columns())
+
+    def save(self, folder, verbose=True):
+        folder = pathlib.Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        if not self.names:
+            return
+        self.write_chrome_trace(folder / 'timer_trace.json')
+        self.write_columns(folder / 'timers.npz')
+        summary = self.summary()
+        with open(folder / 'timer_summary.json', 'w') as f:
+            json.dump(summary, f, indent=4)
+        if verbose:
+            print(f'{"timer":<60}{"p50 [ms]":>12}{"p95 [ms]":>12}{"max [ms]":>12}')
+            for name, s in sorted(summary.items(), key=lambda x: -x[1]['p95'])[:20]:
+                print(f'{name[-60:]:<60}{s["p50"] * 1e3:>12.3f}{s["p95"] * 1e3:>12.3f}{s["max"] * 1e3:>12.3f}')
+            print(f'Timer trace saved to {folder}')
+
+def load_columns(path):
+    with np.load(path) as data:
+        return {k: data[k] for k in data.files}
@@ -0,0 +1,38 @@
+import time
+import contextlib
+
+class Timing:
+    '''
+    Collect wall time of named phases, e.g.:
+
+        timing = Timing()
+        with timing('advance'):
+            world.advance()
+        timing.report()
+    '''
+    def __init__(self):
+        self.records = {}
+
+    @contextlib.contextmanager
+    def __call__(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.records.setdefault(name, []).append(time.perf_counter() - t)
+
+    def total(self, name):
+        return sum(self.records.get(name, []))
+
+    def summary(self):
+        return {
+            name: {'count': len(ts), 'total': sum(ts), 'mean': sum(ts) / len(ts), 'max': max(ts)}
+            for name, ts in self.records.items()
+        }
+
+    def report(self):
+        for name, s in self.summary().items():
+            print(f'{name:<24} count={s["count"]:<6} total={s["total"]:.4f}s mean={s["mean"]:.4f}s max={s["max"]:.4f}s')
+
+# shared by the helpers of this package
+timing = Timing()
@@ -0,0 +1,42 @@
+import sys
+import pathlib as pl
+
+python_root = pl.Path(__file__).absolute().parent.parent
+sys.path.append(str(python_root / '15_scene_commit'))
+
+from commit_log import CommitLog, CommitLogWriter, COMMIT
+
+
+class AppendingCommitLog(CommitLog):
+    '''
+    A CommitLog whose index read is preceded by an append of the writer, as if the
+    server appended between refresh()'s fstat and its index read.
+    '''
+    writer = None
+    append = None
+
+    def _read_index(self):
+        if self.append is not None:
+            frame, payload = self.append
+            self.append = None
+            self.writer.append(frame, payload)
+        return super()._read_index()
+
+
+def test_refresh_with_concurrent_append(tmp_path):
+    path = str(tmp_path / 'commits.log')
+    with CommitLogWriter(path) as writer:
+        writer.append(1, b'first')
+        AppendingCommitLog.writer = writer
+        log = AppendingCommitLog(path)
+        writer.append(2, b'second')
+        log.append = (3, b'third')
+        log.refresh()
+        # frame 3 is in the index but beyond the size refresh() mapped
+        assert log.frames() == [1, 2]
+        log.refresh()
+        assert log.frames() == [1, 2, 3]
+        assert log.last_frame == 3
+        assert log.kind(3) == COMMIT
+        assert bytes(log.record(3)) == b'third'
+        log.close()